@@ -0,0 +1,129 @@
+"""Moves finished bookings out of the hot collection into an archive"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+# Statuses a booking never leaves
+FINAL_STATUSES = ["completed", "cancelled"]
+
+class BookingArchiver:
+    """Periodically moves bookings in a final status dated more than
+    max_age_days ago to the archive collection, batch_size at a time.
+
+    Availability, listings and indexes then only carry recent and active
+    bookings. A batch is copied with upserts before it is deleted, so a
+    crash in between leaves copies the next run overwrites, and several
+    workers may run at once.
+    """
+
+    def __init__(
+        self,
+        hot,
+        archive,
+        max_age_days: int = 90,
+        batch_size: int = 500,
+        interval_seconds: float = 3600
+    ):
+        self.hot = hot
+        self.archive = archive
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        """A booking from the hot collection, else from the archive.
+
+        Bookings are copied before they are deleted, so one missed by the
+        first read is always found by the second.
+        """
+        booking = await self.hot.find_one(query, projection)
+        if booking is None:
+            booking = await self.archive.find_one(query, projection)
+        return booking
+
+    async def find_all(
+        self,
+        query: dict,
+        projection: Optional[dict] = None,
+        sort=None,
+        limit: int = 0,
+        batch_size: int = 0
+    ) -> AsyncIterator[dict]:
+        """Hot bookings, then archived ones, each once even if moved meanwhile.
+
+        sort, limit and batch_size apply to each collection separately. Seen ids are
+        kept in memory, which stays small as the hot collection is.
+        projection must include id.
+        """
+        seen = set()
+        for collection in (self.hot, self.archive):
+            cursor = collection.find(query, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            if batch_size:
+                cursor = cursor.batch_size(batch_size)
+            async for booking in cursor:
+                if collection is self.hot:
+                    seen.add(booking["id"])
+                elif booking["id"] in seen:
+                    continue
+                yield booking
+
+    async def archive_batch(self, cutoff: str) -> int:
+        """Move up to batch_size bookings dated before cutoff; returns how many moved"""
+        bookings = await self.hot.find(
+            {"date": {"$lt": cutoff}, "status": {"$in": FINAL_STATUSES}}
+        ).limit(self.batch_size).to_list(self.batch_size)
+        if not bookings:
+            return 0
+
+        await self.archive.bulk_write(
+            [ReplaceOne({"_id": booking["_id"]}, booking, upsert=True) for booking in bookings],
+            ordered=False
+        )
+        await self.hot.delete_many({
+            "_id": {"$in": [booking["_id"] for booking in bookings]},
+            "status": {"$in": FINAL_STATUSES}
+        })
+        return len(bookings)
+
+    async def archive_once(self) -> int:
+        """Move every booking old enough now; returns how many moved"""
+        cutoff = (datetime.now(timezone.utc).date() - timedelta(days=self.max_age_days)).isoformat()
+        moved = 0
+        while True:
+            count = await self.archive_batch(cutoff)
+            moved += count
+            if count < self.batch_size:
+                break
+            # Let requests through between batches
+            await asyncio.sleep(0)
+        if moved:
+            logger.info(f"Archived {moved} bookings dated before {cutoff}")
+        return moved
+
+    async def _run(self):
+        while True:
+            try:
+                await self.archive_once()
+            except Exception as e:
+                logger.warning(f"Failed to archive bookings: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
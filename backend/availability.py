@@ -0,0 +1,206 @@
+"""Duration-aware slot availability backed by one occupancy document per day"""
+import asyncio
+import logging
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Granularity of the occupancy bitmap
+SLOT_MINUTES = 15
+
+# Opening hours; a service has to start and finish inside one period
+WORKING_PERIODS = [("08:00", "12:00"), ("13:00", "18:00")]
+
+# Start times offered to customers
+START_TIMES = [
+    "08:00", "09:00", "10:00", "11:00",
+    "13:00", "14:00", "15:00", "16:00", "17:00"
+]
+
+def to_minutes(time: str) -> int:
+    hours, minutes = time.split(":")
+    return int(hours) * 60 + int(minutes)
+
+class AvailabilityEngine:
+    """Tracks how many bays are busy in every SLOT_MINUTES cell of a day.
+
+    Each day is a single document ``{"_id": date, "cells": {"<index>": count}}``
+    where ``index`` is minutes since midnight divided by the cell size. Missing
+    cells are free. Reservations update every cell a service covers in one
+    conditional upsert, which MongoDB applies atomically to the document.
+
+    Single days read by get_cells are cached for cache_seconds. This
+    process's reserve/release drop the cached day at once; writes made by
+    other workers show up when the entry expires.
+    """
+
+    def __init__(
+        self,
+        collection,
+        capacity: int = 1,
+        slot_minutes: int = SLOT_MINUTES,
+        periods: Iterable[Tuple[str, str]] = WORKING_PERIODS,
+        start_times: Iterable[str] = START_TIMES,
+        cache_seconds: float = 2,
+        max_cached_days: int = 1000
+    ):
+        self.collection = collection
+        self.capacity = capacity
+        self.slot_minutes = slot_minutes
+        self.periods = [(to_minutes(start), to_minutes(end)) for start, end in periods]
+        self.start_times = list(start_times)
+        self.cache_seconds = cache_seconds
+        self.max_cached_days = max_cached_days
+        self._cache: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    def cells_for(self, time: str, duration_minutes: int) -> Optional[List[int]]:
+        """Cell indexes covered by a service, or None if it doesn't fit the working hours"""
+        if time not in self.start_times:
+            return None
+
+        start = to_minutes(time)
+        end = start + max(duration_minutes, self.slot_minutes)
+        for period_start, period_end in self.periods:
+            if period_start <= start and end <= period_end:
+                first = start // self.slot_minutes
+                last = -(-end // self.slot_minutes)
+                return list(range(first, last))
+        return None
+
+    async def get_cells(self, date: str) -> Dict[str, int]:
+        """Occupancy of one day; the returned dict is shared, don't modify it.
+
+        Concurrent misses for the same date wait on a single query.
+        """
+        cached = self._cache.get(date)
+        if cached and cached[0] > monotonic():
+            return cached[1]
+
+        task = self._loading.get(date)
+        if task is None:
+            task = asyncio.ensure_future(self._load_cells(date))
+            self._loading[date] = task
+        # A cancelled caller must not cancel the query others are waiting on
+        return await asyncio.shield(task)
+
+    async def _load_cells(self, date: str) -> Dict[str, int]:
+        task = asyncio.current_task()
+        try:
+            day = await self.collection.find_one({"_id": date}, {"_id": 0, "cells": 1})
+            cells = (day or {}).get("cells", {})
+            # After an invalidate() this result may predate the write; serve
+            # it to the callers already waiting but don't cache it
+            if self._loading.get(date) is task and self.cache_seconds > 0:
+                if len(self._cache) >= self.max_cached_days:
+                    now = monotonic()
+                    self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
+                    if len(self._cache) >= self.max_cached_days:
+                        self._cache.clear()
+                self._cache[date] = (monotonic() + self.cache_seconds, cells)
+            return cells
+        finally:
+            if self._loading.get(date) is task:
+                del self._loading[date]
+
+    def invalidate(self, date: Optional[str] = None):
+        """Forget the cached occupancy of a day, or of every day"""
+        if date is None:
+            self._cache.clear()
+            self._loading.clear()
+        else:
+            self._cache.pop(date, None)
+            self._loading.pop(date, None)
+
+    async def get_cells_range(self, date_from: str, date_to: str) -> Dict[str, Dict[str, int]]:
+        """Occupancy of every day in an inclusive ISO date range, in one query"""
+        days = {}
+        async for day in self.collection.find({"_id": {"$gte": date_from, "$lte": date_to}}):
+            days[day["_id"]] = day.get("cells", {})
+        return days
+
+    def timeslots(self, cells: Dict[str, int], duration_minutes: int) -> List[dict]:
+        """Start times with whether a service of the given duration fits there"""
+        timeslots = []
+        for time in self.start_times:
+            covered = self.cells_for(time, duration_minutes)
+            available = covered is not None and all(
+                cells.get(str(index), 0) < self.capacity for index in covered
+            )
+            timeslots.append({"time": time, "available": available})
+        return timeslots
+
+    async def reserve(self, date: str, time: str, duration_minutes: int) -> bool:
+        """Atomically take one bay for every cell the service covers.
+
+        When any cell is full the filter misses and the upsert collides with
+        the existing _id, so concurrent callers get exactly one winner. The
+        same collision happens when two requests create a day's document at
+        once; the document exists by then, so the update is retried without
+        upsert and the filter alone decides.
+        """
+        covered = self.cells_for(time, duration_minutes)
+        if covered is None:
+            return False
+
+        query = {"_id": date}
+        for index in covered:
+            query[f"cells.{index}"] = {"$not": {"$gte": self.capacity}}
+        update = {"$inc": {f"cells.{index}": 1 for index in covered}}
+
+        try:
+            await self.collection.update_one(query, update, upsert=True)
+            return True
+        except DuplicateKeyError:
+            result = await self.collection.update_one(query, update)
+            return result.modified_count == 1
+        finally:
+            # Even a lost race means the cached day was out of date
+            self.invalidate(date)
+
+    async def release(self, date: str, time: str, duration_minutes: int):
+        """Give back the bay taken by reserve"""
+        covered = self.cells_for(time, duration_minutes)
+        if covered is None:
+            return
+
+        query = {"_id": date}
+        for index in covered:
+            query[f"cells.{index}"] = {"$gt": 0}
+
+        result = await self.collection.update_one(
+            query,
+            {"$inc": {f"cells.{index}": -1 for index in covered}}
+        )
+        self.invalidate(date)
+        if not result.modified_count:
+            logger.warning(f"Occupancy for {date} {time} was already released")
+
+    async def rebuild(self, bookings: Iterable[dict]):
+        """Replace the occupancy documents with counts derived from active bookings.
+
+        Each booking needs date, time and duration_minutes.
+        """
+        days: Dict[str, Dict[str, int]] = {}
+        for booking in bookings:
+            covered = self.cells_for(booking["time"], booking["duration_minutes"])
+            if covered is None:
+                logger.warning(f"Booking {booking.get('id')} is outside working hours")
+                continue
+            cells = days.setdefault(booking["date"], {})
+            for index in covered:
+                cells[str(index)] = cells.get(str(index), 0) + 1
+
+        await self.collection.delete_many({})
+        operations = [
+            UpdateOne({"_id": date}, {"$set": {"cells": cells}}, upsert=True)
+            for date, cells in days.items()
+        ]
+        if operations:
+            await self.collection.bulk_write(operations)
+        self.invalidate()
+        logger.info(f"Rebuilt occupancy for {len(operations)} days")
@@ -0,0 +1,177 @@
+"""Streaming CSV / NDJSON encoding and parsing for booking import and export"""
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterable, AsyncIterator, List, Tuple, Union
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Leading characters that make spreadsheets evaluate a CSV cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def escape_cell(value):
+    """Quote text a spreadsheet would run as a formula, e.g. +55 21... or =HYPERLINK(...)"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def unescape_cell(value: str) -> str:
+    """Undo escape_cell, so exported files import back unchanged"""
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+async def encode_rows(
+    rows: AsyncIterable[dict],
+    format: str,
+    fields: List[str],
+    batch_size: int = 500
+) -> AsyncIterator[str]:
+    """Serialize documents as they arrive, yielding one text chunk per batch.
+
+    Memory stays bounded by batch_size no matter how many rows there are.
+    """
+    buffer = io.StringIO()
+    writer = None
+    if format == "csv":
+        writer = csv.DictWriter(buffer, fields, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+
+    count = 0
+    async for row in rows:
+        if writer:
+            writer.writerow({field: escape_cell(row.get(field)) for field in fields})
+        else:
+            buffer.write(json.dumps({field: row.get(field) for field in fields}, ensure_ascii=False, default=str))
+            buffer.write("\n")
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def read_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def ends_in_quotes(record: str) -> bool:
+    """Whether a CSV record stops inside a quoted value, i.e. continues on the next line.
+
+    Follows csv.reader: a quote only opens a quoted value at the start of a
+    field, so a stray one like Aro 20" sport is plain text.
+    """
+    state = "start"
+    for ch in record:
+        if state == "quoted":
+            if ch == '"':
+                state = "quote"
+        elif ch == ",":
+            state = "start"
+        elif state == "quote" and ch == '"':
+            # A doubled quote inside a quoted value
+            state = "quoted"
+        elif state == "start" and ch == '"':
+            state = "quoted"
+        else:
+            state = "field"
+    return state == "quoted"
+
+# Lines one quoted CSV value may span before its opening quote is reported
+CSV_MAX_RECORD_LINES = 50
+
+def take_csv_records(
+    pending: List[Tuple[int, str]],
+    final: bool = False
+) -> List[Tuple[int, Union[List[str], ValueError]]]:
+    """Parse the complete records at the front of pending, numbered by their first line.
+
+    Lines of a record still inside a quoted value stay in pending. A quote
+    left open for CSV_MAX_RECORD_LINES lines, or at the end of the input,
+    is reported on its line and parsing resumes with the next line.
+    """
+    records = []
+    while pending:
+        if not pending[0][1].strip():
+            pending.pop(0)
+            continue
+        record = pending[0][1]
+        length = 1
+        while ends_in_quotes(record) and length < len(pending):
+            record += "\n" + pending[length][1]
+            length += 1
+        if ends_in_quotes(record):
+            if not final and len(pending) < CSV_MAX_RECORD_LINES:
+                break
+            records.append((pending.pop(0)[0], ValueError("Aspas não fechadas")))
+            continue
+        records.append((pending[0][0], next(csv.reader([record]))))
+        del pending[:length]
+    return records
+
+async def parse_rows(
+    lines: AsyncIterable[str],
+    format: str
+) -> AsyncIterator[Tuple[int, Union[dict, ValueError]]]:
+    """Yield (line number, row) pairs; unparseable lines yield a ValueError instead.
+
+    CSV input needs a header line. Empty CSV cells are left out of the row so
+    optional fields fall back to their defaults. A quoted value may span
+    several lines; the row is numbered by the line it starts on.
+    """
+    header = None
+
+    def csv_row(values):
+        nonlocal header
+        if isinstance(values, ValueError):
+            return values
+        if header is None:
+            header = values
+            return None
+        if len(values) != len(header):
+            return ValueError(f"Esperadas {len(header)} colunas, encontradas {len(values)}")
+        return {name: unescape_cell(value) for name, value in zip(header, values) if value != ""}
+
+    line_number = 0
+    pending: List[Tuple[int, str]] = []
+    async for line in lines:
+        line_number += 1
+        if format == "csv":
+            pending.append((line_number, line))
+            for record_line, values in take_csv_records(pending):
+                row = csv_row(values)
+                if row is not None:
+                    yield record_line, row
+            continue
+
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"JSON inválido: {str(e)}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError("Cada linha deve ser um objeto JSON")
+            continue
+        yield line_number, row
+
+    for record_line, values in take_csv_records(pending, final=True):
+        row = csv_row(values)
+        if row is not None:
+            yield record_line, row
@@ -0,0 +1,57 @@
+"""In-process cache of the services catalog"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional
+
+class ServiceCatalog:
+    """Caches db.services for ttl_seconds and exposes an ETag of its content.
+
+    The catalog is tiny and rarely written, so every read is served from
+    memory. Writers call invalidate() so the next read reloads it; other
+    processes pick the change up when their TTL expires.
+    """
+
+    def __init__(self, collection, ttl_seconds: float = 300):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._services: List[dict] = []
+        self._by_id: Dict[str, dict] = {}
+        self._etag: Optional[str] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._generation += 1
+        self._expires_at = 0.0
+
+    async def _ensure_fresh(self):
+        if time.monotonic() < self._expires_at:
+            return
+        async with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            if time.monotonic() < self._expires_at:
+                return
+            generation = self._generation
+            services = await self.collection.find({}, {"_id": 0}).to_list(100)
+            payload = json.dumps(services, sort_keys=True, separators=(",", ":"))
+            self._services = services
+            self._by_id = {service["id"]: service for service in services}
+            self._etag = '"' + hashlib.sha256(payload.encode()).hexdigest()[:32] + '"'
+            # An invalidate() during the reload means this copy may be stale
+            if generation == self._generation:
+                self._expires_at = time.monotonic() + self.ttl_seconds
+
+    async def get_all(self) -> List[dict]:
+        await self._ensure_fresh()
+        return self._services
+
+    async def get(self, service_id: str) -> Optional[dict]:
+        await self._ensure_fresh()
+        return self._by_id.get(service_id)
+
+    async def etag(self) -> str:
+        await self._ensure_fresh()
+        return self._etag
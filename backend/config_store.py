@@ -0,0 +1,98 @@
+"""Runtime configuration stored in MongoDB with an in-memory snapshot"""
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    version: int
+    values: Mapping[str, Any] = field(default_factory=dict)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.values.get(key, default)
+
+# Called with the new snapshot after every change; may be a coroutine function
+Subscriber = Callable[[ConfigSnapshot], Any]
+
+class ConfigStore:
+    """A versioned settings document readers see through an immutable snapshot.
+
+    Readers call snapshot() and never touch the database. save() bumps the
+    version in MongoDB and swaps the local snapshot at once; other workers
+    notice the new version on their next poll and swap theirs. Values missing
+    from the document fall back to ``defaults`` (typically the environment).
+    """
+
+    def __init__(self, collection, key: str, defaults: Dict[str, Any], poll_interval: float = 2):
+        self.collection = collection
+        self.key = key
+        self.defaults = dict(defaults)
+        self.poll_interval = poll_interval
+        self._snapshot = ConfigSnapshot(0, MappingProxyType(dict(self.defaults)))
+        self._subscribers: List[Subscriber] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> ConfigSnapshot:
+        return self._snapshot
+
+    def subscribe(self, subscriber: Subscriber):
+        self._subscribers.append(subscriber)
+
+    async def _swap(self, document: Optional[dict]):
+        document = document or {}
+        version = document.get("version", 0)
+        # A slow poll may return an older version than a save already applied
+        if version <= self._snapshot.version:
+            return
+        values = {**self.defaults, **document.get("values", {})}
+        self._snapshot = ConfigSnapshot(version, MappingProxyType(values))
+        logger.info(f"Configuration {self.key} is now at version {version}")
+
+        for subscriber in self._subscribers:
+            try:
+                result = subscriber(self._snapshot)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Configuration subscriber failed: {str(e)}")
+
+    async def load(self):
+        await self._swap(await self.collection.find_one({"_id": self.key}))
+
+    async def save(self, values: Dict[str, Any]) -> ConfigSnapshot:
+        """Persist new values atomically and apply them to this process"""
+        document = await self.collection.find_one_and_update(
+            {"_id": self.key},
+            {"$set": {f"values.{name}": value for name, value in values.items()}, "$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        await self._swap(document)
+        return self._snapshot
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                current = await self.collection.find_one({"_id": self.key}, {"version": 1})
+                if current and current.get("version", 0) != self._snapshot.version:
+                    await self.load()
+            except Exception as e:
+                logger.warning(f"Failed to refresh configuration {self.key}: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
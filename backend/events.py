@@ -0,0 +1,99 @@
+"""Booking change feed for live dashboards"""
+import asyncio
+import logging
+from typing import Optional, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+CREATED = "booking.created"
+UPDATED = "booking.updated"
+# Sent to a subscriber that fell behind and lost events; it should refetch
+RESYNC = "resync"
+
+class Subscription:
+    def __init__(self, max_pending: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Deltas are useless once one is lost; replace the backlog with a resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": RESYNC})
+
+class BookingEventBus:
+    """Fans booking created/updated events out to subscribers.
+
+    When MongoDB supports change streams (replica sets), events come from a
+    watch on the bookings collection, so every worker sees every write. On a
+    standalone server it falls back to in-process publishing, where each
+    worker only sees the writes it handled itself.
+    """
+
+    def __init__(self, max_pending: int = 100, retry_seconds: float = 30):
+        self.max_pending = max_pending
+        self.retry_seconds = retry_seconds
+        self.using_change_stream = False
+        self._subscriptions: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.max_pending)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def _broadcast(self, event: dict):
+        for subscription in list(self._subscriptions):
+            subscription.push(event)
+
+    def publish(self, event_type: str, booking: dict):
+        """Publish a write made by this process; a no-op while the change stream is active"""
+        if not self.using_change_stream:
+            self._broadcast({"type": event_type, "booking": booking})
+
+    def publish_resync(self):
+        """Tell subscribers to refetch, for bulk writes too large to send as deltas"""
+        if not self.using_change_stream:
+            self._broadcast({"type": RESYNC})
+
+    async def _watch(self, collection):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        while True:
+            try:
+                async with collection.watch(pipeline, full_document="updateLookup") as stream:
+                    self.using_change_stream = True
+                    logger.info("Booking events follow the bookings change stream")
+                    async for change in stream:
+                        booking = change.get("fullDocument")
+                        if not booking:
+                            continue
+                        booking.pop("_id", None)
+                        event_type = CREATED if change["operationType"] == "insert" else UPDATED
+                        self._broadcast({"type": event_type, "booking": booking})
+            except OperationFailure as e:
+                # Standalone servers can't open change streams at all
+                self.using_change_stream = False
+                logger.info(f"Change streams unavailable, publishing booking events in process: {str(e)}")
+                return
+            except PyMongoError as e:
+                self.using_change_stream = False
+                logger.warning(f"Booking change stream interrupted: {str(e)}")
+                self._broadcast({"type": RESYNC})
+                await asyncio.sleep(self.retry_seconds)
+
+    def start(self, collection):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(collection))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
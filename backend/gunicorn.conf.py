@@ -0,0 +1,44 @@
+"""Gunicorn settings for serving the API with one uvicorn worker per core.
+
+Run from the backend directory:
+
+    gunicorn server:app -c gunicorn.conf.py
+
+The app is preloaded in the master so workers fork with modules and
+templates already in memory; each worker opens its own MongoDB client in the
+app lifespan. Every setting can be overridden with the environment.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8001')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then so slow leaks can't build up; the jitter
+# keeps them from all restarting at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+
+# Workers write Prometheus samples here so /metrics can merge them; this
+# has to be set before the app (and prometheus_client) is imported
+metrics_dir_created = "PROMETHEUS_MULTIPROC_DIR" not in os.environ
+if metrics_dir_created:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="bmb-metrics-")
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    if metrics_dir_created:
+        shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
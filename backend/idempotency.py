@@ -0,0 +1,82 @@
+"""Idempotency keys: remember the first response to a request and replay it"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of IdempotencyStore.begin
+STARTED = "started"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+class IdempotencyStore:
+    """One document per key, claimed before the work and completed after it.
+
+    The first request inserts the key as in progress; retries then either
+    replay the stored response, or learn the original is still running. A
+    claim whose worker died is taken over once lock_seconds pass. Keys are
+    removed by a TTL index on expires_at after ttl_seconds.
+    """
+
+    def __init__(self, collection, ttl_seconds: float = 24 * 3600, lock_seconds: float = 60):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+
+    async def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[dict]]:
+        """Claim a key; returns (STARTED, None) or the reason the work must not run.
+
+        REPLAY comes with the stored {"status_code", "body"}. MISMATCH means
+        the key was used before for a different request body.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.insert_one({
+                "_id": key,
+                "fingerprint": fingerprint,
+                "status": IN_PROGRESS,
+                "locked_until": now + timedelta(seconds=self.lock_seconds),
+                "expires_at": now + timedelta(seconds=self.ttl_seconds)
+            })
+            return STARTED, None
+        except DuplicateKeyError:
+            pass
+
+        record = await self.collection.find_one({"_id": key})
+        if record is None:
+            # Expired between the insert and the read; treat as in progress
+            # rather than racing another request for it
+            return IN_PROGRESS, None
+        if record["fingerprint"] != fingerprint:
+            return MISMATCH, None
+        if record["status"] != IN_PROGRESS:
+            return REPLAY, record["response"]
+
+        taken_over = await self.collection.find_one_and_update(
+            {"_id": key, "status": IN_PROGRESS, "locked_until": {"$lte": now}},
+            {"$set": {"locked_until": now + timedelta(seconds=self.lock_seconds)}},
+            return_document=ReturnDocument.AFTER
+        )
+        if taken_over:
+            logger.warning(f"Idempotency key {key} taken over after its lock expired")
+            return STARTED, None
+        return IN_PROGRESS, None
+
+    async def exists(self, key: str) -> bool:
+        """Whether a key is stored, whatever its state"""
+        return await self.collection.find_one({"_id": key}, {"_id": 1}) is not None
+
+    async def complete(self, key: str, status_code: int, body):
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"status": "completed", "response": {"status_code": status_code, "body": body}}}
+        )
+
+    async def release(self, key: str):
+        """Forget a claim whose work failed, so a retry runs it again"""
+        await self.collection.delete_one({"_id": key, "status": IN_PROGRESS})
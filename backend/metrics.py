@@ -0,0 +1,158 @@
+"""Prometheus instrumentation for HTTP requests, MongoDB commands and notifications"""
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from pymongo import monitoring
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and operation",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error",
+    ["collection", "command"]
+)
+NOTIFICATION_QUEUE_DEPTH = Gauge(
+    "notification_queue_depth",
+    "Notifications waiting in the outbox",
+    # Every worker sees the same shared queue
+    multiprocess_mode="max"
+)
+NOTIFICATION_SEND_DURATION = Histogram(
+    "notification_send_duration_seconds",
+    "Time to deliver a notification, or its share of a batch",
+    ["channel", "outcome"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route.
+
+    Routes are labelled by their path template (e.g. /api/bookings/{booking_id})
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method,
+                getattr(route, "path", "unmatched"),
+                str(status["code"])
+            ).observe(time.perf_counter() - start)
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times every MongoDB command; pass it in the client's event_listeners"""
+
+    # Commands whose first value is not a collection name
+    NON_COLLECTION_COMMANDS = {"getMore", "killCursors", "endSessions", "ping", "hello", "isMaster", "saslStart", "saslContinue"}
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = "-"
+        if event.command_name not in self.NON_COLLECTION_COMMANDS:
+            value = event.command.get(event.command_name)
+            if isinstance(value, str):
+                collection = value
+        elif event.command_name == "getMore":
+            collection = event.command.get("collection", "-")
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _collection(self, event):
+        return self._collections.pop((event.connection_id, event.request_id), "-")
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.labels(self._collection(event), event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event):
+        collection = self._collection(event)
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+def send_outcome(result) -> str:
+    """Outcome label of what an outbox sender returned for one notification"""
+    if isinstance(result, Exception):
+        return "error"
+    return "skipped" if result is False else "ok"
+
+def timed_sender(channel: str, sender):
+    """Wrap an outbox sender so each delivery is recorded in NOTIFICATION_SEND_DURATION"""
+    async def wrapper(notification):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await sender(notification)
+            outcome = send_outcome(result)
+            return result
+        finally:
+            NOTIFICATION_SEND_DURATION.labels(channel, outcome).observe(time.perf_counter() - start)
+    return wrapper
+
+def timed_batch_sender(channel: str, sender):
+    """Wrap an outbox batch sender so each notification of a batch is recorded
+    with its own outcome and an even share of the batch's time"""
+    async def wrapper(notifications):
+        start = time.perf_counter()
+        outcomes = ["error"] * len(notifications)
+        try:
+            results = await sender(notifications)
+            outcomes = [send_outcome(result) for result in results]
+            return results
+        finally:
+            share = (time.perf_counter() - start) / max(len(notifications), 1)
+            for outcome in outcomes:
+                NOTIFICATION_SEND_DURATION.labels(channel, outcome).observe(share)
+    return wrapper
+
+def render_latest():
+    """Current metrics in the Prometheus text format.
+
+    Under gunicorn (PROMETHEUS_MULTIPROC_DIR set) the samples of all workers
+    are merged, so any worker can answer a scrape.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
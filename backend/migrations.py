@@ -0,0 +1,88 @@
+"""Versioned data migrations recorded in the meta collection"""
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, List
+from uuid import uuid4
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+def checksum(data: Any) -> str:
+    """Stable checksum of JSON-serialisable fixture data"""
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+@dataclass
+class Migration:
+    """A named data change, re-applied whenever its checksum changes.
+
+    apply() should be idempotent: a worker that takes over an expired claim
+    may run it again after a crash.
+    """
+    name: str
+    checksum: str
+    apply: Callable[[], Awaitable[None]]
+
+async def _claim(meta, lock_id: str, owner: str, lock_seconds: float) -> bool:
+    now = datetime.now(timezone.utc)
+    lock = {"owner": owner, "expires_at": now + timedelta(seconds=lock_seconds)}
+    try:
+        await meta.insert_one({"_id": lock_id, **lock})
+        return True
+    except DuplicateKeyError:
+        # Take over the claim of a worker that died while applying
+        taken = await meta.find_one_and_update(
+            {"_id": lock_id, "expires_at": {"$lte": now}},
+            {"$set": lock}
+        )
+        return taken is not None
+
+async def apply_migrations(
+    meta,
+    migrations: List[Migration],
+    lock_seconds: float = 600,
+    poll_seconds: float = 0.5
+) -> List[str]:
+    """Run the migrations whose recorded checksum differs and return their names.
+
+    Each migration is claimed with a lock document in meta, so when several
+    workers start together one applies it and the others wait until its
+    checksum is recorded. A claim older than lock_seconds is taken over.
+    """
+    owner = uuid4().hex
+    applied = []
+    for migration in migrations:
+        record_id = f"migration:{migration.name}"
+        lock_id = f"{record_id}:lock"
+        while True:
+            record = await meta.find_one({"_id": record_id}, {"checksum": 1})
+            if record and record.get("checksum") == migration.checksum:
+                break
+            if not await _claim(meta, lock_id, owner, lock_seconds):
+                await asyncio.sleep(poll_seconds)
+                continue
+            try:
+                # Another worker may have finished between the read and the claim
+                record = await meta.find_one({"_id": record_id}, {"checksum": 1})
+                if record and record.get("checksum") == migration.checksum:
+                    break
+                await migration.apply()
+                await meta.update_one(
+                    {"_id": record_id},
+                    {"$set": {
+                        "checksum": migration.checksum,
+                        "applied_at": datetime.now(timezone.utc).isoformat()
+                    }},
+                    upsert=True
+                )
+            finally:
+                await meta.delete_one({"_id": lock_id, "owner": owner})
+            logger.info(f"Applied migration {migration.name}")
+            applied.append(migration.name)
+            break
+    return applied
@@ -0,0 +1,82 @@
+"""Notification templates loaded and compiled once at startup"""
+import html
+import logging
+from pathlib import Path
+from string import Template
+from typing import Dict, List, Mapping, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCALE = "pt_BR"
+
+# Channels whose output is HTML and therefore gets escaped values
+HTML_CHANNELS = {"html"}
+
+class CompiledTemplate:
+    """A template pre-split into literal chunks and placeholder names.
+
+    Uses string.Template syntax ($name / ${name} / $$). Rendering is a single
+    join over the precomputed parts, with no parsing per call.
+    """
+
+    def __init__(self, source: str, escape: bool = False):
+        self.escape = escape
+        self.literals: List[str] = []
+        self.fields: List[str] = []
+
+        position = 0
+        chunk = []
+        for match in Template.pattern.finditer(source):
+            chunk.append(source[position:match.start()])
+            position = match.end()
+            if match.group("escaped") is not None:
+                chunk.append("$")
+                continue
+            name = match.group("named") or match.group("braced")
+            if name is None:
+                raise ValueError(f"Invalid placeholder at position {match.start()}")
+            self.literals.append("".join(chunk))
+            self.fields.append(name)
+            chunk = []
+        chunk.append(source[position:])
+        self.literals.append("".join(chunk))
+
+    def render(self, context: Mapping[str, object]) -> str:
+        parts = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            value = str(context[name])
+            parts.append(html.escape(value) if self.escape else value)
+            parts.append(literal)
+        return "".join(parts)
+
+class NotificationTemplates:
+    """Registry of templates read from ``<name>.<locale>.<channel>`` files.
+
+    Dropping a new file in the directory is enough to add a template or a
+    locale; channels in use are subject, html, text and whatsapp.
+    """
+
+    def __init__(self, directory: Path, default_locale: str = DEFAULT_LOCALE):
+        self.default_locale = default_locale
+        self._templates: Dict[Tuple[str, str, str], CompiledTemplate] = {}
+        for path in sorted(directory.iterdir()):
+            parts = path.name.split(".")
+            if len(parts) != 3:
+                continue
+            name, locale, channel = parts
+            source = path.read_text(encoding="utf-8")
+            if channel == "subject":
+                source = source.strip()
+            self._templates[(name, locale, channel)] = CompiledTemplate(
+                source, escape=channel in HTML_CHANNELS
+            )
+        logger.info(f"Loaded {len(self._templates)} notification templates")
+
+    def render(self, name: str, channel: str, context: Mapping[str, object], locale: str = None) -> str:
+        """Render a template, falling back to the default locale"""
+        template = self._templates.get((name, locale or self.default_locale, channel))
+        if template is None:
+            template = self._templates.get((name, self.default_locale, channel))
+        if template is None:
+            raise KeyError(f"No template {name}.{channel} for locale {locale}")
+        return template.render(context)
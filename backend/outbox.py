@@ -0,0 +1,204 @@
+"""Durable notification queue stored in MongoDB and drained by async workers"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+from uuid import uuid4
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+PROCESSING = "processing"
+SENT = "sent"
+SKIPPED = "skipped"
+DEAD = "dead"
+
+# A sender delivers one notification. It raises to request a retry and
+# returns False when the notification was deliberately not sent.
+Sender = Callable[[dict], Awaitable[bool]]
+
+# A batch sender delivers several notifications of one channel together and
+# returns, for each, True/False as above or the exception that it raised.
+BatchSender = Callable[[List[dict]], Awaitable[List[Union[bool, Exception]]]]
+
+class NotificationOutbox:
+    """Queue of notifications with retries, exponential backoff and dead-lettering.
+
+    Each document carries a channel, recipient and rendered content. Workers
+    claim one document at a time by moving next_attempt_at past a lease, so
+    a document held by a crashed worker becomes claimable again once its
+    lease expires. After max_attempts failures it is parked as dead.
+
+    Channels with a batch sender are drained up to batch_size documents at a
+    time so the sender can reuse one connection for all of them.
+    """
+
+    def __init__(
+        self,
+        collection,
+        senders: Dict[str, Sender],
+        batch_senders: Optional[Dict[str, BatchSender]] = None,
+        batch_size: int = 10,
+        workers: int = 4,
+        max_attempts: int = 6,
+        base_delay: float = 5,
+        max_delay: float = 3600,
+        lease_seconds: float = 120,
+        poll_interval: float = 2
+    ):
+        self.collection = collection
+        self.senders = senders
+        self.batch_senders = batch_senders or {}
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._running = False
+
+    async def enqueue(self, notifications: List[dict], **fields):
+        """Persist notifications; extra fields (e.g. booking_id) are stored on each"""
+        if not notifications:
+            return
+        now = datetime.now(timezone.utc)
+        documents = [
+            {
+                "_id": str(uuid4()),
+                **fields,
+                **notification,
+                "status": PENDING,
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now
+            }
+            for notification in notifications
+        ]
+        await self.collection.insert_many(documents)
+        self._wakeup.set()
+
+    async def claim(self, channel: Optional[str] = None) -> Optional[dict]:
+        """Lease the next due notification, or None if nothing is due"""
+        now = datetime.now(timezone.utc)
+        query = {"status": {"$in": [PENDING, PROCESSING]}, "next_attempt_at": {"$lte": now}}
+        if channel:
+            query["channel"] = channel
+        return await self.collection.find_one_and_update(
+            query,
+            {
+                "$set": {"status": PROCESSING, "next_attempt_at": now + timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    async def process(self, notification: dict):
+        sender = self.senders.get(notification["channel"])
+        try:
+            if sender is None:
+                raise ValueError(f"No sender for channel {notification['channel']}")
+            delivered = await sender(notification)
+        except Exception as e:
+            await self._fail(notification, str(e))
+            return
+        await self._complete(notification, delivered)
+
+    async def process_batch(self, notifications: List[dict]):
+        batch_sender = self.batch_senders[notifications[0]["channel"]]
+        try:
+            results = await batch_sender(notifications)
+        except Exception as e:
+            results = [e] * len(notifications)
+
+        for notification, result in zip(notifications, results):
+            if isinstance(result, Exception):
+                await self._fail(notification, str(result))
+            else:
+                await self._complete(notification, result)
+
+    async def _complete(self, notification: dict, delivered: bool):
+        await self.collection.update_one(
+            {"_id": notification["_id"]},
+            {"$set": {
+                "status": SENT if delivered is not False else SKIPPED,
+                "completed_at": datetime.now(timezone.utc)
+            }}
+        )
+
+    async def _fail(self, notification: dict, error: str):
+        attempts = notification["attempts"]
+        if attempts >= self.max_attempts:
+            logger.error(f"Notification {notification['_id']} dead after {attempts} attempts: {error}")
+            update = {"status": DEAD, "last_error": error}
+        else:
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=self.backoff(attempts))
+            logger.warning(f"Notification {notification['_id']} failed (attempt {attempts}): {error}")
+            update = {"status": PENDING, "next_attempt_at": retry_at, "last_error": error}
+        await self.collection.update_one({"_id": notification["_id"]}, {"$set": update})
+
+    async def _worker(self):
+        # wait_for may swallow a cancellation that races with the wakeup,
+        # so workers also stop on the flag rather than on cancel alone
+        while self._running:
+            try:
+                notification = await self.claim()
+            except Exception as e:
+                logger.error(f"Failed to claim notification: {str(e)}")
+                notification = None
+
+            if notification is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._dispatch(notification)
+            except Exception as e:
+                # The lease will expire and the notification will be retried
+                logger.error(f"Failed to process notification {notification['_id']}: {str(e)}")
+
+    async def _dispatch(self, notification: dict):
+        channel = notification["channel"]
+        if channel not in self.batch_senders:
+            await self.process(notification)
+            return
+
+        batch = [notification]
+        while len(batch) < self.batch_size:
+            extra = await self.claim(channel)
+            if extra is None:
+                break
+            batch.append(extra)
+        await self.process_batch(batch)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._running = True
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._running = False
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def depth(self) -> int:
+        """Notifications waiting to be delivered"""
+        return await self.collection.count_documents({"status": {"$in": [PENDING, PROCESSING]}})
@@ -0,0 +1,123 @@
+"""Token-bucket rate limiting kept in memory or shared through MongoDB"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+class MemoryRateLimiter:
+    """Buckets of `capacity` tokens refilled evenly over period_seconds.
+
+    State lives in this process, so each worker limits on its own. The least
+    recently used keys are dropped past max_keys to bound memory.
+    """
+
+    def __init__(self, capacity: int, period_seconds: float, max_keys: int = 100_000):
+        self.capacity = capacity
+        self.rate = capacity / period_seconds
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def hit(self, key: str) -> float:
+        """Take a token; returns 0 if one was available, else seconds to wait"""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+class MongoRateLimiter:
+    """The same buckets stored one document per key, shared by every worker.
+
+    Refill and take happen in one pipeline update timed by the server clock.
+    Keys found empty are remembered locally until they refill, so repeated
+    rejections don't reach the database. Documents expire once a bucket
+    would be full again (TTL index on expires_at).
+    """
+
+    def __init__(self, collection, name: str, capacity: int, period_seconds: float, max_keys: int = 100_000):
+        self.collection = collection
+        self.name = name
+        self.capacity = capacity
+        self.rate = capacity / period_seconds
+        self.period_ms = int(period_seconds * 1000)
+        self.max_keys = max_keys
+        self._empty_until: Dict[str, float] = {}
+
+    def _take(self, key: str):
+        elapsed_ms = {"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}
+        return self.collection.find_one_and_update(
+            {"_id": f"{self.name}:{key}"},
+            [
+                {"$set": {"tokens": {"$min": [
+                    self.capacity,
+                    {"$add": [{"$ifNull": ["$tokens", self.capacity]}, {"$multiply": [elapsed_ms, self.rate / 1000]}]}
+                ]}}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "updated_at": "$$NOW",
+                    "expires_at": {"$add": ["$$NOW", self.period_ms]}
+                }}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def hit(self, key: str) -> float:
+        """Take a token; returns 0 if one was available, else seconds to wait"""
+        now = time.monotonic()
+        empty_until = self._empty_until.get(key)
+        if empty_until is not None:
+            if empty_until > now:
+                return empty_until - now
+            del self._empty_until[key]
+
+        try:
+            try:
+                bucket = await self._take(key)
+            except DuplicateKeyError:
+                # Two workers created the document at once; the retry updates it
+                bucket = await self._take(key)
+        except PyMongoError as e:
+            # Failing open keeps bookings working while the database struggles
+            logger.warning(f"Rate limiter {self.name} unavailable: {str(e)}")
+            return 0.0
+
+        if bucket["allowed"]:
+            return 0.0
+
+        wait = (1 - bucket["tokens"]) / self.rate
+        if len(self._empty_until) >= self.max_keys:
+            self._empty_until = {k: until for k, until in self._empty_until.items() if until > now}
+        self._empty_until[key] = now + wait
+        return wait
+
+def create_rate_limiter(
+    backend: str,
+    collection,
+    name: str,
+    capacity: int,
+    period_seconds: float
+) -> Optional[Union[MemoryRateLimiter, MongoRateLimiter]]:
+    """Limiter for the configured backend: "memory", "mongo" or "none" (disabled)"""
+    if backend == "none" or capacity <= 0:
+        return None
+    if backend == "mongo":
+        return MongoRateLimiter(collection, name, capacity, period_seconds)
+    if backend != "memory":
+        logger.warning(f"Unknown rate limit backend {backend}, using memory")
+    return MemoryRateLimiter(capacity, period_seconds)
@@ -0,0 +1,212 @@
+"""Reminders sent a fixed time before each appointment"""
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from events import BookingEventBus, RESYNC, Subscription
+
+logger = logging.getLogger(__name__)
+
+# Statuses that still get a reminder
+ACTIVE_STATUSES = ["pending", "confirmed"]
+
+class ReminderScheduler:
+    """Min-heap of the reminders due within the next window_hours.
+
+    Upcoming bookings are loaded with one query on the date index, and again
+    every half window, so nothing ever scans the whole collection. Between
+    loads the heap follows booking events: new bookings are added and
+    cancelled or finished ones dropped. Other workers' bookings arrive
+    through the change stream when there is one, or at the next load.
+
+    Every worker may run a scheduler. A reminder is claimed by setting
+    reminder_sent_at on a booking that is still active, so each goes out
+    once, and a restart resumes from what the database says is unsent.
+    """
+
+    def __init__(
+        self,
+        collection,
+        send: Callable[[dict], Awaitable[None]],
+        lead_hours: float = 24,
+        window_hours: float = 6,
+        timezone_name: str = "America/Sao_Paulo"
+    ):
+        self.collection = collection
+        self.send = send
+        self.lead_seconds = lead_hours * 3600
+        self.window_seconds = window_hours * 3600
+        self.timezone = ZoneInfo(timezone_name)
+        self._heap: List[Tuple[float, str]] = []
+        self._scheduled: Dict[str, Tuple[float, dict]] = {}
+        self._horizon = 0.0
+        self._reload_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._running = False
+        self._tasks: List[asyncio.Task] = []
+        self._events: Optional[BookingEventBus] = None
+        self._subscription: Optional[Subscription] = None
+
+    def appointment_at(self, booking: dict) -> float:
+        """Start of the appointment as a Unix timestamp"""
+        start = datetime.fromisoformat(f"{booking['date']}T{booking['time']}")
+        return start.replace(tzinfo=self.timezone).timestamp()
+
+    def due_at(self, booking: dict) -> Optional[float]:
+        """When a booking's reminder is due, or None if it was booked after that.
+
+        A booking made within lead_hours of its appointment already got its
+        confirmation moments ago, so it gets no reminder.
+        """
+        due = self.appointment_at(booking) - self.lead_seconds
+        try:
+            created_at = datetime.fromisoformat(booking["created_at"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return due
+        return due if due >= created_at else None
+
+    def _schedule(self, booking: dict, due: float):
+        current = self._scheduled.get(booking["id"])
+        self._scheduled[booking["id"]] = (due, booking)
+        if current is None or current[0] != due:
+            heapq.heappush(self._heap, (due, booking["id"]))
+            self._wakeup.set()
+
+    def cancel(self, booking_id: str):
+        # The heap entry stays behind and is skipped when it comes up
+        self._scheduled.pop(booking_id, None)
+
+    def track(self, booking: dict):
+        """Schedule or drop a booking's reminder after it was created or changed"""
+        if booking.get("status") not in ACTIVE_STATUSES or booking.get("reminder_sent_at"):
+            self.cancel(booking["id"])
+            return
+        try:
+            due = self.due_at(booking)
+        except (KeyError, ValueError):
+            return
+        if due is None:
+            self.cancel(booking["id"])
+            return
+        # Later reminders are picked up by the load that reaches them
+        if due <= self._horizon:
+            self._schedule(booking, due)
+
+    async def load(self):
+        """Read the reminders due before the next horizon from the database"""
+        now = time.time()
+        horizon = now + self.window_seconds
+        first = datetime.fromtimestamp(now, self.timezone).date().isoformat()
+        last = datetime.fromtimestamp(horizon + self.lead_seconds, self.timezone).date().isoformat()
+
+        loaded: Dict[str, Tuple[float, dict]] = {}
+        async for booking in self.collection.find(
+            {
+                "date": {"$gte": first, "$lte": last},
+                "status": {"$in": ACTIVE_STATUSES},
+                "reminder_sent_at": {"$exists": False}
+            },
+            {"_id": 0}
+        ):
+            try:
+                appointment = self.appointment_at(booking)
+                due = self.due_at(booking)
+            except (KeyError, ValueError):
+                logger.warning(f"Booking {booking.get('id')} has an invalid date or time")
+                continue
+            if due is not None and appointment > now and due <= horizon:
+                loaded[booking["id"]] = (due, booking)
+
+        # Keep what events added while the query ran
+        for booking_id, (due, booking) in self._scheduled.items():
+            if due <= horizon:
+                loaded.setdefault(booking_id, (due, booking))
+
+        self._scheduled = loaded
+        self._heap = [(due, booking_id) for booking_id, (due, _) in loaded.items()]
+        heapq.heapify(self._heap)
+        self._horizon = horizon
+        self._reload_at = now + self.window_seconds / 2
+
+    async def _remind(self, booking: dict):
+        # Appointments that already started don't need a reminder any more
+        if self.appointment_at(booking) <= time.time():
+            return
+        claimed = await self.collection.find_one_and_update(
+            {"id": booking["id"], "status": {"$in": ACTIVE_STATUSES}, "reminder_sent_at": {"$exists": False}},
+            {"$set": {"reminder_sent_at": datetime.now(timezone.utc)}},
+            projection={"_id": 0}
+        )
+        if not claimed:
+            return
+        try:
+            await self.send(claimed)
+        except Exception:
+            # Give the claim back so the next load retries it
+            await self.collection.update_one({"id": booking["id"]}, {"$unset": {"reminder_sent_at": ""}})
+            raise
+
+    async def _run(self):
+        # Like the outbox workers, stop on the flag since wait_for may
+        # swallow a cancellation
+        while self._running:
+            self._wakeup.clear()
+            try:
+                if time.time() >= self._reload_at:
+                    await self.load()
+                while self._heap and self._heap[0][0] <= time.time():
+                    due, booking_id = heapq.heappop(self._heap)
+                    entry = self._scheduled.get(booking_id)
+                    if entry is None or entry[0] != due:
+                        continue
+                    del self._scheduled[booking_id]
+                    try:
+                        await self._remind(entry[1])
+                    except Exception as e:
+                        logger.error(f"Failed to send reminder for booking {booking_id}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Failed to load reminders: {str(e)}")
+                self._reload_at = time.time() + 60
+
+            next_at = min(self._reload_at, self._heap[0][0]) if self._heap else self._reload_at
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(next_at - time.time(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _follow(self, subscription):
+        while self._running:
+            event = await subscription.queue.get()
+            if event["type"] == RESYNC:
+                # Events were lost; reload instead of guessing
+                self._reload_at = 0.0
+                self._wakeup.set()
+            elif event.get("booking"):
+                self.track(event["booking"])
+
+    def start(self, events: BookingEventBus):
+        if self._tasks:
+            return
+        self._running = True
+        self._events = events
+        self._subscription = events.subscribe()
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._follow(self._subscription))
+        ]
+
+    async def stop(self):
+        self._running = False
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._events:
+            self._events.unsubscribe(self._subscription)
+            self._events = None
+            self._subscription = None
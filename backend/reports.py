@@ -0,0 +1,152 @@
+"""Per-day booking rollups maintained alongside every booking write"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import AsyncIterable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+
+def contribution(booking: dict, status: str, price: float) -> Dict[str, float]:
+    """Counters a booking adds to its day while it is in the given status.
+
+    A status change is applied as contribution(new) - contribution(old), so
+    any transition, including one back out of a terminal status, stays exact.
+    """
+    service = f"services.{booking['service_id']}"
+    counters = {
+        "bookings": 1,
+        f"status.{status}": 1,
+        f"{service}.bookings": 1,
+    }
+    if status == CANCELLED:
+        counters[f"{service}.cancelled"] = 1
+    else:
+        # Cancelled bookings don't occupy their hour
+        counters[f"hours.{booking['time']}"] = 1
+    if status == COMPLETED:
+        counters["revenue"] = price
+        counters[f"{service}.completed"] = 1
+        counters[f"{service}.revenue"] = price
+    return counters
+
+def difference(after: Dict[str, float], before: Dict[str, float]) -> Dict[str, float]:
+    changes = {key: after.get(key, 0) - before.get(key, 0) for key in after.keys() | before.keys()}
+    return {key: value for key, value in changes.items() if value}
+
+def status_value(status) -> str:
+    return getattr(status, "value", status)
+
+class DailyReports:
+    """One document per booking date with counts by status, service and hour.
+
+    Documents look like {"_id": "2030-01-15", "bookings": 4, "revenue": 80.0,
+    "status": {"pending": 1, ...}, "services": {"<id>": {"bookings": 2,
+    "completed": 1, "cancelled": 0, "revenue": 80.0}}, "hours": {"09:00": 2}}.
+    Revenue counts completed bookings at the catalog price.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def _update(self, date: str, counters: Dict[str, float]) -> Optional[UpdateOne]:
+        if not counters:
+            return None
+        return UpdateOne(
+            {"_id": date},
+            {"$inc": counters, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def record_created(self, bookings: Iterable[Tuple[dict, float]]):
+        """Count new bookings, given as (booking, service price) pairs"""
+        operations = [
+            self._update(booking["date"], contribution(booking, status_value(booking["status"]), price))
+            for booking, price in bookings
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def record_transition(self, booking: dict, old_status, new_status, price: float):
+        await self.record_transitions([(booking, old_status, new_status, price)])
+
+    async def record_transitions(self, transitions: Iterable[Tuple[dict, object, object, float]]):
+        """Apply status changes, given as (booking, old status, new status, price)"""
+        operations = []
+        for booking, old_status, new_status, price in transitions:
+            operation = self._update(booking["date"], difference(
+                contribution(booking, status_value(new_status), price),
+                contribution(booking, status_value(old_status), price)
+            ))
+            if operation:
+                operations.append(operation)
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def get_range(self, date_from: str, date_to: str) -> List[dict]:
+        days = []
+        async for day in self.collection.find(
+            {"_id": {"$gte": date_from, "$lte": date_to}},
+            {"updated_at": 0}
+        ).sort("_id", 1):
+            day["date"] = day.pop("_id")
+            days.append(day)
+        return days
+
+    async def rebuild(self, bookings: AsyncIterable[dict], price_of: Callable[[str], float]):
+        """Recompute every day from the bookings themselves.
+
+        Memory grows with the number of days, not bookings.
+        """
+        days: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        async for booking in bookings:
+            counters = contribution(booking, status_value(booking["status"]), price_of(booking["service_id"]))
+            for key, value in counters.items():
+                days[booking["date"]][key] += value
+
+        now = datetime.now(timezone.utc)
+        await self.collection.delete_many({"_id": {"$nin": list(days)}})
+        operations = [
+            ReplaceOne({"_id": date}, {**expand(counters), "updated_at": now}, upsert=True)
+            for date, counters in days.items()
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        logger.info(f"Rebuilt daily reports for {len(operations)} days")
+
+def expand(counters: Dict[str, float]) -> dict:
+    """Turn dotted counter paths into the nested document $inc would build"""
+    document: dict = {}
+    for path, value in counters.items():
+        *parents, leaf = path.split(".")
+        node = document
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return document
+
+def summarize(days: List[dict]) -> dict:
+    """Totals and rates over a list of daily documents"""
+    totals = {"bookings": 0, "revenue": 0.0, "status": defaultdict(int), "services": {}, "hours": defaultdict(int)}
+    for day in days:
+        totals["bookings"] += day.get("bookings", 0)
+        totals["revenue"] += day.get("revenue", 0)
+        for status, count in day.get("status", {}).items():
+            totals["status"][status] += count
+        for hour, count in day.get("hours", {}).items():
+            totals["hours"][hour] += count
+        for service_id, counters in day.get("services", {}).items():
+            service = totals["services"].setdefault(service_id, defaultdict(int))
+            for key, value in counters.items():
+                service[key] += value
+
+    cancelled = totals["status"].get(CANCELLED, 0)
+    totals["cancellation_rate"] = cancelled / totals["bookings"] if totals["bookings"] else 0.0
+    totals["status"] = dict(totals["status"])
+    totals["hours"] = dict(sorted(totals["hours"].items()))
+    totals["services"] = {service_id: dict(counters) for service_id, counters in totals["services"].items()}
+    return totals
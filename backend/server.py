@@ -1,27 +1,118 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 import os
+import json
+import asyncio
+import base64
 import logging
+import math
+import re
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
-from datetime import datetime, timezone, timedelta
+from pydantic import BaseModel, Field, ConfigDict, ValidationError, field_validator
+from typing import Dict, List, Optional, Tuple, Union
+from datetime import date as Date, datetime, timezone, timedelta
 from enum import Enum
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from zoneinfo import ZoneInfo
+
+from archive import BookingArchiver
+from availability import AvailabilityEngine, START_TIMES
+from catalog import ServiceCatalog
+from migrations import Migration, apply_migrations, checksum
+from outbox import NotificationOutbox
+from smtp_pool import SMTPPool
+from notification_templates import NotificationTemplates
+from events import BookingEventBus, CREATED, UPDATED
+from config_store import ConfigSnapshot, ConfigStore
+from reports import DailyReports, summarize
+from idempotency import IdempotencyStore, IN_PROGRESS, MISMATCH, REPLAY
+from rate_limit import MemoryRateLimiter, MongoRateLimiter, create_rate_limiter
+from reminders import ReminderScheduler
+from booking_io import MEDIA_TYPES, encode_rows, parse_rows, read_lines
+from metrics import CommandMetricsListener, MetricsMiddleware, NOTIFICATION_QUEUE_DEPTH, render_latest, timed_batch_sender, timed_sender
 
 ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Per-worker resources, created by connect() when the app starts rather than
+# at import, so a preloading master never holds a client its workers inherit
+client: Optional[AsyncIOMotorClient] = None
+db = None
+notification_config: Optional[ConfigStore] = None
+catalog: Optional[ServiceCatalog] = None
+booking_events: Optional[BookingEventBus] = None
+availability: Optional[AvailabilityEngine] = None
+reports: Optional[DailyReports] = None
+outbox: Optional[NotificationOutbox] = None
+booking_limiters: Dict[str, Union[MemoryRateLimiter, MongoRateLimiter]] = {}
+idempotency: Optional[IdempotencyStore] = None
+archiver: Optional[BookingArchiver] = None
+reminders: Optional[ReminderScheduler] = None
+
+BUSINESS_ADDRESS = "RUA JUIZ JACOB GOLDEMBERG, 4"
+
+templates = NotificationTemplates(ROOT_DIR / 'templates' / 'notifications')
+
+# Notification settings and the environment variables that seed them
+NOTIFICATION_ENV = {
+    "owner_email": ("OWNER_EMAIL", ""),
+    "owner_whatsapp": ("OWNER_WHATSAPP", "+5521992739496"),
+    "smtp_user": ("SMTP_USER", ""),
+    "smtp_password": ("SMTP_PASSWORD", ""),
+    "smtp_server": ("SMTP_SERVER", "smtp.gmail.com"),
+    "smtp_port": ("SMTP_PORT", "587"),
+    # Upgrade plain connections with STARTTLS; "false" for relays without TLS
+    "smtp_starttls": ("SMTP_STARTTLS", "true"),
+    "from_email": ("FROM_EMAIL", ""),
+}
 
-app = FastAPI()
-api_router = APIRouter(prefix="/api")
+
+# Indexes backing the hot queries, keyed by collection
+INDEXES = {
+    "bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("date", ASCENDING), ("time", ASCENDING), ("status", ASCENDING)],
+            name="date_time_status"
+        ),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="status_created_at_id"
+        ),
+        # Prefix search at the counter and the listing's plate filter
+        IndexModel([("phone_digits", ASCENDING), ("created_at", DESCENDING)], name="phone_digits_created_at"),
+        IndexModel([("plate_norm", ASCENDING), ("created_at", DESCENDING)], name="plate_norm_created_at"),
+    ],
+    # Finished bookings moved out of db.bookings by the archiver
+    "bookings_archive": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("phone_digits", ASCENDING), ("created_at", DESCENDING)], name="phone_digits_created_at"),
+        IndexModel([("plate_norm", ASCENDING), ("created_at", DESCENDING)], name="plate_norm_created_at"),
+    ],
+    "services": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "notification_outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        # Delivered notifications are kept for a week; dead ones never get completed_at
+        IndexModel([("completed_at", ASCENDING)], name="completed_at_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
 
 class BookingStatus(str, Enum):
     PENDING = "pending"
@@ -29,6 +120,38 @@ class BookingStatus(str, Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+# Statuses that hold a slot
+ACTIVE_STATUSES = (BookingStatus.PENDING, BookingStatus.CONFIRMED)
+
+# Status changes allowed from each status; completed and cancelled are final
+BOOKING_TRANSITIONS = {
+    BookingStatus.PENDING: (BookingStatus.CONFIRMED, BookingStatus.CANCELLED),
+    BookingStatus.CONFIRMED: (BookingStatus.COMPLETED, BookingStatus.CANCELLED),
+    BookingStatus.COMPLETED: (),
+    BookingStatus.CANCELLED: (),
+}
+
+# Most status changes accepted by one PATCH /api/bookings:bulk
+BULK_UPDATE_MAX_ITEMS = 200
+
+# How long browsers may reuse /api/services before revalidating
+SERVICES_MAX_AGE = 60
+
+# Idle interval after which the booking feed sends a keep-alive comment
+SSE_HEARTBEAT_SECONDS = 15
+
+# Longest range served by /api/availability
+AVAILABILITY_MAX_DAYS = 62
+
+# Duration assumed for bookings stored before durations were recorded
+LEGACY_BOOKING_DURATION = 60
+
+# Longest range served by /api/reports
+REPORTS_MAX_DAYS = 366
+
+# Bump to recompute db.daily_reports from the bookings on next startup
+DAILY_REPORTS_VERSION = 1
+
 class Service(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -43,6 +166,16 @@ class TimeSlot(BaseModel):
     time: str
     available: bool
 
+def parse_booking_date(value: str) -> Date:
+    """A YYYY-MM-DD date; occupancy and reports are keyed on this exact form"""
+    if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+        raise ValueError("Data inválida, use AAAA-MM-DD")
+    return Date.fromisoformat(value)
+
+def business_today() -> Date:
+    """Today in the shop's timezone"""
+    return datetime.now(ZoneInfo(os.environ.get('BUSINESS_TIMEZONE', 'America/Sao_Paulo'))).date()
+
 class BookingCreate(BaseModel):
     service_id: str
     customer_name: str = Field(..., min_length=1)
@@ -52,6 +185,21 @@ class BookingCreate(BaseModel):
     vehicle_plate: str = Field(..., min_length=1)
     date: str
     time: str
+    
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        if parse_booking_date(value) < business_today():
+            raise ValueError("Data no passado")
+        return value
+    
+    @field_validator("time")
+    @classmethod
+    def check_time(cls, value: str) -> str:
+        # Reports bucket bookings by this exact string
+        if value not in START_TIMES:
+            raise ValueError("Horário inválido")
+        return value
 
 class Booking(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -68,50 +216,204 @@ class Booking(BaseModel):
     time: str
     status: BookingStatus
     created_at: str
+    duration_minutes: Optional[int] = None
+    # Incremented by every status change
+    version: int = 0
 
 class BookingUpdate(BaseModel):
     status: BookingStatus
+    # When given, the change only applies while the booking is at this version
+    version: Optional[int] = None
 
-# Notification functions
-def send_email_notification(to_email: str, subject: str, body: str):
-    """Send email notification - temporary solution"""
+class BookingStatusChange(BookingUpdate):
+    id: str
+
+class BulkBookingUpdate(BaseModel):
+    items: List[BookingStatusChange] = Field(..., min_length=1, max_length=BULK_UPDATE_MAX_ITEMS)
+
+class BookingPage(BaseModel):
+    items: List[Booking]
+    next_cursor: Optional[str] = None
+
+class BookingImport(BookingCreate):
+    """An imported row; id, status and created_at are kept when given"""
+    id: Optional[str] = Field(None, min_length=1)
+    status: BookingStatus = BookingStatus.PENDING
+    created_at: Optional[str] = None
+    
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        # History is imported too, so past dates are accepted
+        parse_booking_date(value)
+        return value
+
+BOOKINGS_PAGE_SIZE = 50
+BOOKINGS_MAX_PAGE_SIZE = 200
+
+# Shortest prefixes /api/bookings/search accepts, so it never scans a large
+# share of the index
+SEARCH_MIN_PHONE_DIGITS = 4
+SEARCH_MIN_PLATE_CHARS = 3
+SEARCH_MAX_RESULTS = 50
+
+def normalize_phone(phone: str) -> str:
+    """Digits only, without the Brazilian country code"""
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    # A full number with 55 in front, or any prefix typed with +55
+    if digits.startswith("55") and (len(digits) in (12, 13) or phone.lstrip().startswith("+55")):
+        digits = digits[2:]
+    return digits
+
+def normalize_plate(plate: str) -> str:
+    """Uppercase letters and digits only, so ABC-1D23 and abc 1d23 match"""
+    return "".join(ch for ch in plate.upper() if ch.isalnum())
+
+def booking_document(booking: Booking) -> dict:
+    """The stored form of a booking, with the normalized search keys"""
+    document = booking.model_dump()
+    document["phone_digits"] = normalize_phone(booking.customer_phone)
+    document["plate_norm"] = normalize_plate(booking.vehicle_plate)
+    return document
+
+# Documents fetched per round trip / encoded per chunk by the export
+EXPORT_BATCH_SIZE = 500
+# Rows written per bulk_write by the import
+IMPORT_CHUNK_SIZE = 500
+# Rejected rows listed individually in an import report
+IMPORT_MAX_REPORTED = 100
+
+# Fields a booking is served with. Every stored booking was validated on
+# its way in, so reads that project to these fields can skip the model
+BOOKING_PROJECTION = {"_id": 0, **{field: 1 for field in Booking.model_fields}}
+SERVICE_PROJECTION = list(Service.model_fields)
+
+def trusted_booking(document: dict) -> dict:
+    # Bookings stored before durations were recorded lack the field
+    document.setdefault("duration_minutes", None)
+    document.setdefault("version", 0)
+    return document
+
+def trusted_response(content, **kwargs) -> ORJSONResponse:
+    """Send data read from our own collections without re-validating it.
+
+    Returning a Response makes FastAPI skip the route's response_model,
+    which then only documents the shape. Content must already match it:
+    projected documents that were validated when written.
+    """
+    return ORJSONResponse(content, **kwargs)
+
+def encode_booking_cursor(booking: dict) -> str:
+    """Encode the (created_at, id) position of a booking as an opaque cursor"""
+    raw = json.dumps([booking["created_at"], booking["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_booking_cursor(cursor: str):
+    """Decode a cursor produced by encode_booking_cursor"""
     try:
-        # Get email configuration from environment
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-        smtp_user = os.environ.get('SMTP_USER', '')
-        smtp_password = os.environ.get('SMTP_PASSWORD', '')
-        from_email = os.environ.get('FROM_EMAIL', smtp_user)
-        
-        if not smtp_user or not smtp_password:
-            logger.warning("SMTP credentials not configured. Email not sent.")
-            return False
-        
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = from_email
-        msg['To'] = to_email
-        
-        html_body = f"""
-        <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                {body}
-            </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(html_body, 'html'))
-        
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
-        
-        logger.info(f"Email sent successfully to {to_email}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return False
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, booking_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(created_at, str) or not isinstance(booking_id, str):
+            raise ValueError("invalid cursor")
+        return created_at, booking_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+# Notification functions
+def build_email_message(to_email: str, subject: str, body: str, text: Optional[str] = None) -> MIMEMultipart:
+    config = notification_config.snapshot()
+    from_email = config.get('from_email') or config.get('smtp_user')
+    
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = from_email
+    msg['To'] = to_email
+    
+    html_body = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            {body}
+        </body>
+    </html>
+    """
+    
+    # Alternatives go from plainest to richest
+    if text:
+        msg.attach(MIMEText(text, 'plain'))
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+# Shared SMTP sessions, rebuilt when the SMTP settings change
+smtp_pool: Optional[SMTPPool] = None
+smtp_pool_settings = None
+
+async def get_smtp_pool() -> Optional[SMTPPool]:
+    """Pool for the configured SMTP server, or None if email is not configured.
+
+    Without smtp_user the server is used without logging in (e.g. a local
+    relay), which needs from_email for the sender address.
+    """
+    global smtp_pool, smtp_pool_settings
+    
+    config = notification_config.snapshot()
+    smtp_server = config.get('smtp_server')
+    smtp_port = int(config.get('smtp_port'))
+    smtp_user = config.get('smtp_user')
+    smtp_password = config.get('smtp_password')
+    start_tls = str(config.get('smtp_starttls')).lower() not in ('0', 'false', 'no')
+    
+    if not smtp_server or not (config.get('from_email') or smtp_user):
+        return None
+    if smtp_user and not smtp_password:
+        return None
+    
+    settings = (smtp_server, smtp_port, smtp_user, smtp_password, start_tls)
+    if settings != smtp_pool_settings:
+        if smtp_pool:
+            await smtp_pool.close()
+        smtp_pool = SMTPPool(
+            smtp_server,
+            smtp_port,
+            username=smtp_user,
+            password=smtp_password,
+            # Port 465 speaks TLS from the start; others may upgrade with STARTTLS
+            use_tls=smtp_port == 465,
+            start_tls=start_tls,
+            size=int(os.environ.get('SMTP_POOL_SIZE', '3'))
+        )
+        smtp_pool_settings = settings
+    return smtp_pool
+
+async def reset_smtp_pool(config: ConfigSnapshot):
+    """Drop sessions opened with the previous settings; the next send reconnects"""
+    global smtp_pool, smtp_pool_settings
+    if smtp_pool:
+        await smtp_pool.close()
+    smtp_pool = None
+    smtp_pool_settings = None
+
+async def send_email_notifications(notifications: List[dict]) -> List:
+    """Send a batch of email notifications over pooled SMTP sessions"""
+    pool = await get_smtp_pool()
+    if pool is None:
+        logger.warning("SMTP not configured. Email not sent.")
+        return [False] * len(notifications)
+    
+    messages = [
+        build_email_message(n["recipient"], n["subject"], n["body"], n.get("text"))
+        for n in notifications
+    ]
+    errors = await pool.send_batch(messages)
+    
+    results = []
+    for notification, error in zip(notifications, errors):
+        if error:
+            logger.error(f"Failed to send email to {notification['recipient']}: {str(error)}")
+            results.append(error)
+        else:
+            logger.info(f"Email sent successfully to {notification['recipient']}")
+            results.append(True)
+    return results
 
 def send_whatsapp_notification(phone_number: str, message: str):
     """Send WhatsApp notification via Twilio - placeholder for future implementation"""
@@ -120,118 +422,434 @@ def send_whatsapp_notification(phone_number: str, message: str):
     logger.info(f"WhatsApp notification (placeholder) to {phone_number}: {message}")
     return True
 
-def format_booking_notification(booking: dict, notification_type: str = "owner"):
-    """Format booking information for notifications"""
-    date_formatted = datetime.fromisoformat(booking['date'] + 'T00:00:00').strftime('%d/%m/%Y')
-    
-    if notification_type == "owner":
-        subject = f"🚗 Novo Agendamento - BMB ESTÉTICA AUTOMOTIVA"
-        body = f"""
-        <div style="background: #f4f4f5; padding: 20px; border-radius: 8px;">
-            <h2 style="color: #3b82f6;">Novo Agendamento Recebido!</h2>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="color: #18181b; border-bottom: 2px solid #3b82f6; padding-bottom: 10px;">Detalhes do Serviço</h3>
-                <p><strong>Serviço:</strong> {booking['service_name']}</p>
-                <p><strong>Data:</strong> {date_formatted}</p>
-                <p><strong>Horário:</strong> {booking['time']}</p>
-                <p><strong>Status:</strong> Pendente</p>
-            </div>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="color: #18181b; border-bottom: 2px solid #3b82f6; padding-bottom: 10px;">Dados do Cliente</h3>
-                <p><strong>Nome:</strong> {booking['customer_name']}</p>
-                <p><strong>Telefone:</strong> {booking['customer_phone']}</p>
-                <p><strong>Email:</strong> {booking['customer_email']}</p>
-            </div>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="color: #18181b; border-bottom: 2px solid #3b82f6; padding-bottom: 10px;">Dados do Veículo</h3>
-                <p><strong>Modelo:</strong> {booking['vehicle_model']}</p>
-                <p><strong>Placa:</strong> {booking['vehicle_plate']}</p>
-            </div>
-            
-            <p style="color: #71717a; font-size: 12px; margin-top: 20px;">
-                ID do Agendamento: {booking['id']}
-            </p>
-        </div>
-        """
-    else:  # customer
-        subject = f"✅ Agendamento Confirmado - BMB ESTÉTICA AUTOMOTIVA"
-        body = f"""
-        <div style="background: #f4f4f5; padding: 20px; border-radius: 8px;">
-            <h2 style="color: #3b82f6;">Agendamento Realizado com Sucesso!</h2>
-            <p>Olá, <strong>{booking['customer_name']}</strong>!</p>
-            <p>Seu agendamento foi confirmado. Seguem os detalhes:</p>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="color: #18181b; border-bottom: 2px solid #3b82f6; padding-bottom: 10px;">Detalhes do Agendamento</h3>
-                <p><strong>Serviço:</strong> {booking['service_name']}</p>
-                <p><strong>Data:</strong> {date_formatted}</p>
-                <p><strong>Horário:</strong> {booking['time']}</p>
-            </div>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="color: #18181b; border-bottom: 2px solid #3b82f6; padding-bottom: 10px;">Localização</h3>
-                <p><strong>📍 RUA JUIZ JACOB GOLDEMBERG, 4</strong></p>
-            </div>
-            
-            <div style="background: #e0f2fe; padding: 15px; border-radius: 8px; border-left: 4px solid #3b82f6;">
-                <p style="margin: 0;"><strong>Importante:</strong> Chegue com 10 minutos de antecedência.</p>
-            </div>
-            
-            <p style="color: #71717a; font-size: 12px; margin-top: 20px;">
-                ID do Agendamento: {booking['id']}<br>
-                BMB ESTÉTICA AUTOMOTIVA - Transformando seu veículo com excelência
-            </p>
-        </div>
-        """
-    
-    return subject, body
+def booking_template_context(booking_dict: dict) -> dict:
+    """Values available to booking notification templates"""
+    date = booking_dict['date']
+    return {
+        **booking_dict,
+        "date_formatted": f"{date[8:10]}/{date[5:7]}/{date[:4]}",
+        "address": BUSINESS_ADDRESS
+    }
+
+def render_notifications(template: str, context: dict, email: str, phone: str) -> List[dict]:
+    """Email and WhatsApp notifications for one recipient from a template family"""
+    notifications = []
+    if email:
+        notifications.append({
+            "channel": "email",
+            "recipient": email,
+            "subject": templates.render(template, "subject", context),
+            "body": templates.render(template, "html", context),
+            "text": templates.render(template, "text", context)
+        })
+    if phone:
+        notifications.append({
+            "channel": "whatsapp",
+            "recipient": phone,
+            "body": templates.render(template, "whatsapp", context)
+        })
+    return notifications
+
+def build_reminder_notifications(booking_dict: dict) -> List[dict]:
+    """Customer reminder of an upcoming booking, ready for the outbox"""
+    return render_notifications(
+        "booking_reminder_customer",
+        booking_template_context(booking_dict),
+        booking_dict['customer_email'],
+        booking_dict['customer_phone']
+    )
+
+async def send_reminder(booking_dict: dict):
+    await outbox.enqueue(build_reminder_notifications(booking_dict), booking_id=booking_dict['id'])
+
+def build_booking_notifications(booking_dict: dict) -> List[dict]:
+    """Owner and customer notifications for a new booking, ready for the outbox"""
+    context = booking_template_context(booking_dict)
+    config = notification_config.snapshot()
+    owner_phone = config.get('owner_whatsapp')
+    owner_email = config.get('owner_email')
+    
+    return (
+        render_notifications("booking_created_owner", context, owner_email, owner_phone)
+        + render_notifications(
+            "booking_created_customer", context, booking_dict['customer_email'], booking_dict['customer_phone']
+        )
+    )
+
+async def deliver_whatsapp(notification: dict) -> bool:
+    return send_whatsapp_notification(notification["recipient"], notification["body"])
+
+def connect():
+    """Create this worker's MongoDB client and the components built on it"""
+    global client, db, notification_config, catalog, booking_events, availability, reports, outbox, booking_limiters, idempotency, archiver, reminders
+    if client is not None:
+        return
+    
+    client = AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '50')),
+        minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+        maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000')),
+        waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        connectTimeoutMS=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        socketTimeoutMS=int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '20000')),
+        event_listeners=[CommandMetricsListener()]
+    )
+    db = client[os.environ['DB_NAME']]
+    
+    notification_config = ConfigStore(
+        db.settings,
+        "notification",
+        {name: os.environ.get(env, default) for name, (env, default) in NOTIFICATION_ENV.items()}
+    )
+    notification_config.subscribe(reset_smtp_pool)
+    
+    catalog = ServiceCatalog(db.services, ttl_seconds=float(os.environ.get('SERVICES_CACHE_TTL', '300')))
+    booking_events = BookingEventBus()
+    # Cars that can be worked on at the same time
+    availability = AvailabilityEngine(
+        db.occupancy,
+        capacity=int(os.environ.get('BAY_CAPACITY', '1')),
+        cache_seconds=float(os.environ.get('AVAILABILITY_CACHE_SECONDS', '2'))
+    )
+    reports = DailyReports(db.daily_reports)
+    # Finished bookings older than this many days move to bookings_archive;
+    # 0 keeps everything in db.bookings
+    archiver = BookingArchiver(
+        db.bookings,
+        db.bookings_archive,
+        max_age_days=int(os.environ.get('ARCHIVE_AFTER_DAYS', '90')),
+        batch_size=int(os.environ.get('ARCHIVE_BATCH_SIZE', '500')),
+        interval_seconds=float(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '3600'))
+    )
+    idempotency = IdempotencyStore(
+        db.idempotency_keys,
+        ttl_seconds=float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+    )
+    # Reminders go out this many hours before each appointment; 0 disables them
+    reminders = ReminderScheduler(
+        db.bookings,
+        send_reminder,
+        lead_hours=float(os.environ.get('REMINDER_LEAD_HOURS', '24')),
+        window_hours=float(os.environ.get('REMINDER_WINDOW_HOURS', '6')),
+        timezone_name=os.environ.get('BUSINESS_TIMEZONE', 'America/Sao_Paulo')
+    )
+    outbox = NotificationOutbox(
+        db.notification_outbox,
+        {"whatsapp": timed_sender("whatsapp", deliver_whatsapp)},
+        batch_senders={"email": timed_batch_sender("email", send_email_notifications)},
+        workers=int(os.environ.get('NOTIFICATION_WORKERS', '4')),
+        max_attempts=int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', '6'))
+    )
+    
+    # Bookings each client may create per window; "mongo" shares the
+    # buckets between workers, "memory" keeps them per worker
+    backend = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    window = float(os.environ.get('BOOKING_LIMIT_WINDOW_SECONDS', '3600'))
+    per_contact = int(os.environ.get('BOOKING_LIMIT_PER_CONTACT', '3'))
+    limits = {
+        "ip": int(os.environ.get('BOOKING_LIMIT_PER_IP', '10')),
+        "phone": per_contact,
+        "email": per_contact,
+    }
+    # Behind a proxy every client shares the proxy's address, so the
+    # per-address limit waits until TRUST_PROXY_HEADERS says how many
+    # proxies there are (0 when clients connect directly)
+    if limits["ip"] > 0 and os.environ.get('TRUST_PROXY_HEADERS') is None:
+        logger.warning("TRUST_PROXY_HEADERS is not set; the booking limit per IP is disabled")
+        limits["ip"] = 0
+    booking_limiters = {}
+    for kind, capacity in limits.items():
+        limiter = create_rate_limiter(backend, db.rate_limits, f"booking_{kind}", capacity, window)
+        if limiter:
+            booking_limiters[kind] = limiter
+
+async def ensure_connected():
+    # Platforms that skip the lifespan (e.g. serverless) start on first request
+    if not started:
+        await start_process()
+
+api_router = APIRouter(prefix="/api", dependencies=[Depends(ensure_connected)])
+
+# Services offered by the shop, seeded by the services_catalog migration
+SERVICE_CATALOG = [
+    {
+        "id": "lavagem-simples",
+        "name": "Lavagem Simples",
+        "description": "Lavagem externa completa do veículo com produtos de qualidade",
+        "price": 50.00,
+        "duration_minutes": 30,
+        "image_url": "https://images.pexels.com/photos/6872158/pexels-photo-6872158.jpeg"
+    },
+    {
+        "id": "lavagem-detalhada",
+        "name": "Lavagem Detalhada",
+        "description": "Lavagem completa interna e externa com aspiração e limpeza profunda",
+        "price": 120.00,
+        "duration_minutes": 90,
+        "image_url": "https://images.pexels.com/photos/16376825/pexels-photo-16376825.jpeg"
+    },
+    {
+        "id": "revitalizacao-plasticos",
+        "name": "Revitalização dos Plásticos",
+        "description": "Restauração e proteção dos plásticos internos e externos",
+        "price": 80.00,
+        "duration_minutes": 60,
+        "image_url": "https://images.pexels.com/photos/5158181/pexels-photo-5158181.jpeg"
+    },
+    {
+        "id": "higienizacao-estofados",
+        "name": "Higienização Interna nos Estofados",
+        "description": "Limpeza profunda e higienização completa dos estofados com produtos especializados",
+        "price": 150.00,
+        "duration_minutes": 90,
+        "image_url": "https://images.pexels.com/photos/16376825/pexels-photo-16376825.jpeg"
+    }
+]
+
+async def seed_services():
+    # Upsert by id so re-running never duplicates services
+    operations = [
+        UpdateOne({"id": service["id"]}, {"$set": service}, upsert=True)
+        for service in SERVICE_CATALOG
+    ]
+    await db.services.bulk_write(operations)
+    catalog.invalidate()
+
+async def rebuild_reports():
+    prices = {service["id"]: service["price"] for service in await catalog.get_all()}
+    await reports.rebuild(
+        archiver.find_all({}, {"_id": 0, "id": 1, "service_id": 1, "date": 1, "time": 1, "status": 1}),
+        lambda service_id: prices.get(service_id, 0)
+    )
+
+# Bump to recompute phone_digits / plate_norm for every booking
+SEARCH_FIELDS_VERSION = 1
+
+async def backfill_search_fields():
+    for collection in (db.bookings, db.bookings_archive):
+        operations = []
+        async for booking in collection.find({}, {"_id": 1, "customer_phone": 1, "vehicle_plate": 1}):
+            operations.append(UpdateOne({"_id": booking["_id"]}, {"$set": {
+                "phone_digits": normalize_phone(booking.get("customer_phone", "")),
+                "plate_norm": normalize_plate(booking.get("vehicle_plate", ""))
+            }}))
+            if len(operations) == 500:
+                await collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+
+async def backfill_booking_versions():
+    for collection in (db.bookings, db.bookings_archive):
+        await collection.update_many({"version": {"$exists": False}}, {"$set": {"version": 0}})
+
+async def rebuild_occupancy():
+    """Recompute db.occupancy from active upcoming bookings"""
+    durations = {service["id"]: service["duration_minutes"] for service in await catalog.get_all()}
+    today = datetime.now(timezone.utc).date().isoformat()
+    bookings = []
+    async for booking in db.bookings.find(
+        {"date": {"$gte": today}, "status": {"$in": [s.value for s in ACTIVE_STATUSES]}},
+        {"_id": 0, "id": 1, "service_id": 1, "date": 1, "time": 1, "duration_minutes": 1}
+    ):
+        booking["duration_minutes"] = booking.get("duration_minutes") or durations.get(
+            booking["service_id"], LEGACY_BOOKING_DURATION
+        )
+        bookings.append(booking)
+    
+    await availability.rebuild(bookings)
+
+# Bump to recount db.occupancy from the bookings, e.g. to repair leaked cells
+OCCUPANCY_VERSION = 1
+
+MIGRATIONS = [
+    Migration("services_catalog", checksum(SERVICE_CATALOG), seed_services),
+    Migration("daily_reports", checksum(DAILY_REPORTS_VERSION), rebuild_reports),
+    Migration("booking_search_fields", checksum(SEARCH_FIELDS_VERSION), backfill_search_fields),
+    Migration("booking_versions", checksum({"version": 0}), backfill_booking_versions),
+    Migration("occupancy", checksum(OCCUPANCY_VERSION), rebuild_occupancy),
+]
+
+async def run_migrations():
+    await apply_migrations(db.meta, MIGRATIONS)
+
+async def booking_duration(booking: dict) -> int:
+    """Duration a booking occupies, looking up the service for legacy bookings"""
+    if booking.get("duration_minutes"):
+        return booking["duration_minutes"]
+    service = await catalog.get(booking["service_id"])
+    return service["duration_minutes"] if service else LEGACY_BOOKING_DURATION
 
 @api_router.get("/")
 async def root():
     return {"message": "BMB ESTÉTICA AUTOMOTIVA API"}
 
 @api_router.get("/services", response_model=List[Service])
-async def get_services():
-    services = await db.services.find({}, {"_id": 0}).to_list(100)
-    return services
+async def get_services(request: Request):
+    etag = await catalog.etag()
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={SERVICES_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    services = [
+        {field: service[field] for field in SERVICE_PROJECTION}
+        for service in await catalog.get_all()
+    ]
+    return trusted_response(services, headers=headers)
 
 @api_router.get("/timeslots")
-async def get_timeslots(date: str):
-    working_hours = [
-        "08:00", "09:00", "10:00", "11:00",
-        "13:00", "14:00", "15:00", "16:00", "17:00"
-    ]
+async def get_timeslots(date: str, service_id: Optional[str] = None):
+    duration = availability.slot_minutes
+    if service_id:
+        service = await catalog.get(service_id)
+        if not service:
+            raise HTTPException(status_code=404, detail="Serviço não encontrado")
+        duration = service["duration_minutes"]
     
-    bookings = await db.bookings.find(
-        {"date": date, "status": {"$in": ["pending", "confirmed"]}},
-        {"_id": 0, "time": 1}
-    ).to_list(100)
+    cells = await availability.get_cells(date)
+    return trusted_response(availability.timeslots(cells, duration))
+
+@api_router.get("/availability")
+async def get_availability(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    service_id: Optional[str] = None
+):
+    """Free start times for every day in a date range, for calendar views"""
+    try:
+        first = Date.fromisoformat(date_from)
+        last = Date.fromisoformat(date_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida")
     
-    booked_times = [b["time"] for b in bookings]
+    days_count = (last - first).days + 1
+    if days_count < 1 or days_count > AVAILABILITY_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Intervalo deve ter entre 1 e {AVAILABILITY_MAX_DAYS} dias"
+        )
     
-    timeslots = [
-        {"time": time, "available": time not in booked_times}
-        for time in working_hours
-    ]
+    duration = availability.slot_minutes
+    if service_id:
+        service = await catalog.get(service_id)
+        if not service:
+            raise HTTPException(status_code=404, detail="Serviço não encontrado")
+        duration = service["duration_minutes"]
+    
+    occupancy = await availability.get_cells_range(first.isoformat(), last.isoformat())
     
-    return timeslots
+    days = []
+    for offset in range(days_count):
+        day = (first + timedelta(days=offset)).isoformat()
+        timeslots = availability.timeslots(occupancy.get(day, {}), duration)
+        available_count = sum(1 for slot in timeslots if slot["available"])
+        days.append({
+            "date": day,
+            "timeslots": timeslots,
+            "available_count": available_count,
+            "fully_booked": available_count == 0
+        })
+    
+    return trusted_response(days)
+
+def client_ip(request: Request) -> str:
+    # TRUST_PROXY_HEADERS is the number of proxies in front of the app. Each
+    # appends the address it saw to X-Forwarded-For, so the client is that
+    # many entries from the right; anything further left is client-supplied.
+    hops = int(os.environ.get('TRUST_PROXY_HEADERS', '0') or 0)
+    if hops > 0:
+        forwarded = [
+            entry.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for entry in header.split(",")
+            if entry.strip()
+        ]
+        if forwarded:
+            return forwarded[-min(hops, len(forwarded))]
+    return request.client.host if request.client else ""
+
+async def enforce_booking_limits(request: Request, booking_data: BookingCreate):
+    """Reject clients creating bookings too fast, before any other database work"""
+    keys = {
+        "ip": client_ip(request),
+        "phone": normalize_phone(booking_data.customer_phone),
+        "email": booking_data.customer_email.strip().lower(),
+    }
+    for kind, limiter in booking_limiters.items():
+        if not keys[kind]:
+            continue
+        wait = await limiter.hit(keys[kind])
+        if wait:
+            logger.warning(f"Booking rate limit hit by {kind}")
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas tentativas de agendamento. Tente novamente mais tarde.",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
 
 @api_router.post("/bookings", response_model=Booking)
-async def create_booking(booking_data: BookingCreate, background_tasks: BackgroundTasks):
-    service = await db.services.find_one({"id": booking_data.service_id}, {"_id": 0})
+async def create_booking(
+    booking_data: BookingCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255)
+):
+    """Create a booking.
+
+    Clients that may retry send an Idempotency-Key header; a retry with the
+    same key and body gets the first response back instead of booking again,
+    without counting against the client's rate limit.
+    """
+    if not idempotency_key:
+        await enforce_booking_limits(request, booking_data)
+        return await place_booking(booking_data)
+    
+    key = f"bookings:{idempotency_key}"
+    # Retries of a stored key are not limited, but a new key is only stored
+    # once the client is within its limits
+    if not await idempotency.exists(key):
+        await enforce_booking_limits(request, booking_data)
+    state, response = await idempotency.begin(key, checksum(booking_data.model_dump()))
+    if state == REPLAY:
+        return JSONResponse(response["body"], status_code=response["status_code"], headers={"Idempotent-Replayed": "true"})
+    if state == IN_PROGRESS:
+        raise HTTPException(status_code=409, detail="Agendamento em processamento, tente novamente em instantes")
+    if state == MISMATCH:
+        raise HTTPException(status_code=422, detail="Idempotency-Key já utilizada para outro agendamento")
+    
+    try:
+        booking = await place_booking(booking_data)
+    except HTTPException as e:
+        # Answers that depend on the request (e.g. slot taken) are final;
+        # anything else may succeed on retry
+        try:
+            if e.status_code < 500 and e.status_code != 409:
+                await idempotency.complete(key, e.status_code, {"detail": e.detail})
+            else:
+                await idempotency.release(key)
+        except Exception as store_error:
+            logger.error(f"Failed to store idempotency key {key}: {str(store_error)}")
+        raise
+    except BaseException:
+        await idempotency.release(key)
+        raise
+    
+    # The booking exists now, so answer with it even if the key can't be
+    # updated; retries get 409 until its lock expires
+    try:
+        await idempotency.complete(key, 200, booking.model_dump(mode="json"))
+    except Exception as e:
+        logger.error(f"Failed to store idempotency key {key}: {str(e)}")
+    return booking
+
+async def place_booking(booking_data: BookingCreate) -> Booking:
+    service = await catalog.get(booking_data.service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
     
-    existing = await db.bookings.find_one({
-        "date": booking_data.date,
-        "time": booking_data.time,
-        "status": {"$in": ["pending", "confirmed"]}
-    })
-    
-    if existing:
+    duration = service["duration_minutes"]
+    if not await availability.reserve(booking_data.date, booking_data.time, duration):
         raise HTTPException(status_code=400, detail="Horário não disponível")
     
     from uuid import uuid4
@@ -249,242 +867,558 @@ async def create_booking(booking_data: BookingCreate, background_tasks: Backgrou
         date=booking_data.date,
         time=booking_data.time,
         status=BookingStatus.PENDING,
-        created_at=datetime.now(timezone.utc).isoformat()
+        created_at=datetime.now(timezone.utc).isoformat(),
+        duration_minutes=duration
     )
     
-    await db.bookings.insert_one(booking.model_dump())
+    try:
+        await db.bookings.insert_one(booking_document(booking))
+    except Exception:
+        await availability.release(booking_data.date, booking_data.time, duration)
+        raise
     
-    # Send notifications in background
-    booking_dict = booking.model_dump()
+    booking_events.publish(CREATED, booking.model_dump(mode="json"))
     
-    # Notification to owner
-    owner_phone = os.environ.get('OWNER_WHATSAPP', '+5521992739496')
-    owner_email = os.environ.get('OWNER_EMAIL', '')
+    try:
+        await reports.record_created([(booking.model_dump(), service["price"])])
+    except Exception as e:
+        logger.error(f"Failed to update reports for booking {booking.id}: {str(e)}")
     
-    if owner_email:
-        subject, body = format_booking_notification(booking_dict, "owner")
-        background_tasks.add_task(send_email_notification, owner_email, subject, body)
+    # Notifications are delivered by the outbox workers, not this request
+    try:
+        await outbox.enqueue(build_booking_notifications(booking.model_dump()), booking_id=booking.id)
+    except Exception as e:
+        logger.error(f"Failed to queue notifications for booking {booking.id}: {str(e)}")
     
-    # WhatsApp notification placeholder (will be implemented with Twilio)
-    whatsapp_message = f"""
-🚗 *Novo Agendamento - BMB ESTÉTICA AUTOMOTIVA*
+    return booking
 
-*Serviço:* {booking_dict['service_name']}
-*Data:* {booking_dict['date']}
-*Horário:* {booking_dict['time']}
+def build_booking_query(
+    status: Optional[BookingStatus] = None,
+    service_id: Optional[str] = None,
+    plate: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> dict:
+    query = {}
+    if status:
+        query["status"] = status
+    if service_id:
+        query["service_id"] = service_id
+    if plate:
+        query["plate_norm"] = normalize_plate(plate)
+    if date_from or date_to:
+        query["date"] = {}
+        if date_from:
+            query["date"]["$gte"] = date_from
+        if date_to:
+            query["date"]["$lte"] = date_to
+    return query
 
-*Cliente:* {booking_dict['customer_name']}
-*Telefone:* {booking_dict['customer_phone']}
-*Veículo:* {booking_dict['vehicle_model']} - {booking_dict['vehicle_plate']}
+@api_router.get("/bookings", response_model=BookingPage)
+async def get_bookings(
+    status: Optional[BookingStatus] = None,
+    service_id: Optional[str] = None,
+    plate: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(BOOKINGS_PAGE_SIZE, ge=1, le=BOOKINGS_MAX_PAGE_SIZE),
+    archived: bool = False
+):
+    """List bookings newest first, one keyset page at a time.
 
-ID: {booking_dict['id']}
-"""
-    background_tasks.add_task(send_whatsapp_notification, owner_phone, whatsapp_message)
+    Pages are ordered by (created_at, id) descending; pass the returned
+    next_cursor back to fetch the following page. With archived=true the
+    pages come from the archive instead of the current bookings.
+    """
+    query = build_booking_query(status, service_id, plate, date_from, date_to)
+    if cursor:
+        created_at, booking_id = decode_booking_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": booking_id}}
+        ]
     
-    # Notification to customer
-    subject, body = format_booking_notification(booking_dict, "customer")
-    background_tasks.add_task(send_email_notification, booking_data.customer_email, subject, body)
+    # Fetch one extra row to know whether another page exists
+    collection = db.bookings_archive if archived else db.bookings
+    db_cursor = collection.find(query, BOOKING_PROJECTION).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).batch_size(limit + 1)
     
-    # Customer WhatsApp notification
-    customer_whatsapp_message = f"""
-✅ *Agendamento Confirmado - BMB ESTÉTICA AUTOMOTIVA*
+    items = []
+    next_cursor = None
+    async for booking in db_cursor:
+        if len(items) == limit:
+            next_cursor = encode_booking_cursor(items[-1])
+            break
+        items.append(trusted_booking(booking))
+    
+    return trusted_response({"items": items, "next_cursor": next_cursor})
 
-Olá *{booking_dict['customer_name']}*!
+@api_router.get("/bookings/events")
+async def stream_booking_events(request: Request):
+    """Server-Sent Events feed of booking created/updated deltas"""
+    subscription = booking_events.subscribe()
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                data = json.dumps(event.get("booking"), default=str)
+                yield f"event: {event['type']}\ndata: {data}\n\n"
+        finally:
+            booking_events.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-*Serviço:* {booking_dict['service_name']}
-*Data:* {booking_dict['date']}
-*Horário:* {booking_dict['time']}
+@api_router.get("/bookings/search", response_model=List[Booking])
+async def search_bookings(
+    phone: Optional[str] = None,
+    plate: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_RESULTS)
+):
+    """Newest bookings whose phone and/or plate start with the given prefixes.
 
-📍 *Local:* RUA JUIZ JACOB GOLDEMBERG, 4
+    Input is normalized like the stored keys, so "(21) 99999" and
+    "abc-1" work; each prefix is an anchored, index-backed range scan.
+    """
+    query = {}
+    if phone is not None:
+        digits = normalize_phone(phone)
+        if len(digits) < SEARCH_MIN_PHONE_DIGITS:
+            raise HTTPException(status_code=400, detail=f"Informe ao menos {SEARCH_MIN_PHONE_DIGITS} dígitos do telefone")
+        query["phone_digits"] = {"$regex": f"^{digits}"}
+    if plate is not None:
+        plate_norm = normalize_plate(plate)
+        if len(plate_norm) < SEARCH_MIN_PLATE_CHARS:
+            raise HTTPException(status_code=400, detail=f"Informe ao menos {SEARCH_MIN_PLATE_CHARS} caracteres da placa")
+        query["plate_norm"] = {"$regex": f"^{plate_norm}"}
+    if not query:
+        raise HTTPException(status_code=400, detail="Informe o telefone ou a placa")
+    
+    # Older customers may only have archived bookings left
+    matches = [
+        booking async for booking in archiver.find_all(query, BOOKING_PROJECTION, [("created_at", -1)], limit)
+    ]
+    matches.sort(key=lambda booking: booking["created_at"], reverse=True)
+    return trusted_response([trusted_booking(booking) for booking in matches[:limit]])
 
-Chegue com 10 minutos de antecedência.
+@api_router.get("/bookings/export")
+async def export_bookings(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    status: Optional[BookingStatus] = None,
+    service_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """Stream every matching booking as CSV or NDJSON.
 
-ID: {booking_dict['id']}
-"""
-    background_tasks.add_task(send_whatsapp_notification, booking_data.customer_phone, customer_whatsapp_message)
+    Current bookings come first, then archived ones, each oldest first.
+    """
+    query = build_booking_query(status, service_id, None, date_from, date_to)
+    db_cursor = archiver.find_all(query, {"_id": 0}, [("created_at", 1), ("id", 1)], batch_size=EXPORT_BATCH_SIZE)
     
-    return booking
+    filename = f"agendamentos-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        encode_rows(db_cursor, format, list(Booking.model_fields), EXPORT_BATCH_SIZE),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-@api_router.get("/bookings", response_model=List[Booking])
-async def get_bookings(status: Optional[str] = None):
-    query = {}
-    if status:
-        query["status"] = status
+def report_import_error(report: dict, kind: str, line: int, booking_id: Optional[str], detail: str):
+    report[kind] += 1
+    if len(report["errors"]) < IMPORT_MAX_REPORTED:
+        report["errors"].append({"line": line, "id": booking_id, "type": kind, "detail": detail})
+
+async def import_booking_chunk(rows: list, report: dict):
+    """Insert one chunk of validated rows, taking slots for the active ones"""
+    from uuid import uuid4
+    now = datetime.now(timezone.utc).isoformat()
+    prices = {}
+    candidates = []
+    for line, item in rows:
+        service = await catalog.get(item.service_id)
+        if not service:
+            report_import_error(report, "invalid", line, item.id, "Serviço não encontrado")
+            continue
+        prices[service["id"]] = service["price"]
+        candidates.append((line, Booking(
+            **item.model_dump(exclude={"id", "created_at"}),
+            id=item.id or str(uuid4()),
+            service_name=service["name"],
+            created_at=item.created_at or now,
+            duration_minutes=service["duration_minutes"]
+        )))
+    
+    # Known ids are rejected before they can take a slot; the unique index
+    # still catches duplicates that race in between
+    existing = set()
+    async for booking in archiver.find_all(
+        {"id": {"$in": [booking.id for _, booking in candidates]}}, {"_id": 0, "id": 1}
+    ):
+        existing.add(booking["id"])
+    fresh = []
+    for line, booking in candidates:
+        if booking.id in existing:
+            report_import_error(report, "conflicts", line, booking.id, "Agendamento já existe")
+        else:
+            fresh.append((line, booking))
+    candidates = fresh
+    
+    active = [index for index, (_, booking) in enumerate(candidates) if booking.status in ACTIVE_STATUSES]
+    reserved = await asyncio.gather(*(
+        availability.reserve(candidates[index][1].date, candidates[index][1].time, candidates[index][1].duration_minutes)
+        for index in active
+    ))
+    rejected = {index for index, ok in zip(active, reserved) if not ok}
+    
+    to_insert = []
+    for index, (line, booking) in enumerate(candidates):
+        if index in rejected:
+            report_import_error(report, "conflicts", line, booking.id, "Horário não disponível")
+        else:
+            to_insert.append((line, booking))
+    if not to_insert:
+        return
+    
+    failures = []
+    try:
+        await db.bookings.bulk_write(
+            [InsertOne(booking_document(booking)) for _, booking in to_insert],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        failures = e.details.get("writeErrors", [])
+    except Exception:
+        for _, booking in to_insert:
+            if booking.status in ACTIVE_STATUSES:
+                await availability.release(booking.date, booking.time, booking.duration_minutes)
+        raise
+    
+    for failure in failures:
+        line, booking = to_insert[failure["index"]]
+        if booking.status in ACTIVE_STATUSES:
+            await availability.release(booking.date, booking.time, booking.duration_minutes)
+        if failure.get("code") == 11000:
+            report_import_error(report, "conflicts", line, booking.id, "Agendamento já existe")
+        else:
+            report_import_error(report, "invalid", line, booking.id, failure.get("errmsg", "Erro ao gravar"))
     
-    bookings = await db.bookings.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return bookings
+    failed = {failure["index"] for failure in failures}
+    inserted = [booking for index, (_, booking) in enumerate(to_insert) if index not in failed]
+    report["imported"] += len(inserted)
+    try:
+        await reports.record_created([(booking.model_dump(), prices[booking.service_id]) for booking in inserted])
+    except Exception as e:
+        logger.error(f"Failed to update reports for imported bookings: {str(e)}")
+
+@api_router.post("/bookings/import")
+async def import_bookings(request: Request, format: str = Query("ndjson", pattern="^(csv|ndjson)$")):
+    """Create bookings from a CSV or NDJSON body, read and written in chunks.
+
+    Rows are validated like a new booking and may also carry id, status and
+    created_at, so an export can be loaded back as it is. Active rows must
+    win their slot; rows whose id or slot is already taken are reported as
+    conflicts. No notifications are sent for imported bookings.
+    """
+    report = {"imported": 0, "invalid": 0, "conflicts": 0, "errors": []}
+    chunk = []
+    async for line, row in parse_rows(read_lines(request.stream()), format):
+        if isinstance(row, ValueError):
+            report_import_error(report, "invalid", line, None, str(row))
+            continue
+        try:
+            chunk.append((line, BookingImport(**row)))
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            report_import_error(report, "invalid", line, row.get("id"), detail)
+            continue
+        if len(chunk) == IMPORT_CHUNK_SIZE:
+            await import_booking_chunk(chunk, report)
+            chunk = []
+    if chunk:
+        await import_booking_chunk(chunk, report)
+    
+    if report["imported"]:
+        booking_events.publish_resync()
+    return report
 
 @api_router.get("/bookings/{booking_id}", response_model=Booking)
 async def get_booking(booking_id: str):
-    booking = await db.bookings.find_one({"id": booking_id}, {"_id": 0})
+    booking = await archiver.find_one({"id": booking_id}, BOOKING_PROJECTION)
     if not booking:
         raise HTTPException(status_code=404, detail="Agendamento não encontrado")
-    return booking
+    return trusted_response(trusted_booking(booking))
+
+def transition_error(current: dict, change: BookingUpdate) -> Optional[HTTPException]:
+    """Why a status change can't be applied to a booking as read, or None"""
+    if change.version is not None and change.version != current["version"]:
+        return HTTPException(status_code=409, detail="Agendamento foi alterado, tente novamente")
+    status = BookingStatus(current["status"])
+    if change.status not in BOOKING_TRANSITIONS[status]:
+        return HTTPException(
+            status_code=400,
+            detail=f"Não é possível alterar o status de {status.value} para {change.status.value}"
+        )
+    return None
+
+def status_update(current: dict, status: BookingStatus, changed_at: str) -> Tuple[dict, dict]:
+    """Filter and update that apply a change only if nobody moved the booking meanwhile"""
+    return (
+        {"id": current["id"], "version": current["version"]},
+        {"$set": {"status": status, "status_changed_at": changed_at}, "$inc": {"version": 1}}
+    )
+
+async def apply_status_changes(changes: List[Tuple[dict, dict]]):
+    """Side effects of status changes already written, given as (before, after) pairs.
+
+    Frees the slot of bookings leaving an active status, updates the daily
+    reports and tells live dashboards.
+    """
+    released = []
+    releases = []
+    for before, after in changes:
+        if before["status"] in ACTIVE_STATUSES and after["status"] not in ACTIVE_STATUSES:
+            released.append(before)
+            releases.append(availability.release(before["date"], before["time"], await booking_duration(before)))
+    for booking, outcome in zip(released, await asyncio.gather(*releases, return_exceptions=True)):
+        if isinstance(outcome, Exception):
+            logger.error(f"Failed to release the slot of booking {booking['id']}: {str(outcome)}")
+    
+    try:
+        transitions = []
+        for before, after in changes:
+            service = await catalog.get(before["service_id"])
+            transitions.append((before, before["status"], after["status"], service["price"] if service else 0))
+        await reports.record_transitions(transitions)
+    except Exception as e:
+        logger.error(f"Failed to update reports for {len(changes)} status changes: {str(e)}")
+    
+    for before, after in changes:
+        booking_events.publish(UPDATED, after)
+
+@api_router.patch("/bookings:bulk")
+async def update_bookings(changes: BulkBookingUpdate):
+    """Apply many status changes in one round trip, e.g. when closing the day.
+
+    Every item is checked like a single PATCH and succeeds or fails on its
+    own. Results come back in request order, each with the status code the
+    single endpoint would have answered and either the booking or a detail.
+    """
+    ids = [item.id for item in changes.items]
+    current = {
+        booking["id"]: booking
+        async for booking in archiver.find_all({"id": {"$in": ids}}, BOOKING_PROJECTION)
+    }
+    
+    results = []
+    accepted = []
+    seen = set()
+    for item in changes.items:
+        booking = current.get(item.id)
+        if item.id in seen:
+            error = HTTPException(status_code=400, detail="Agendamento repetido na requisição")
+        elif not booking:
+            error = HTTPException(status_code=404, detail="Agendamento não encontrado")
+        else:
+            error = transition_error(booking, item)
+        seen.add(item.id)
+        
+        if error:
+            results.append({"id": item.id, "status_code": error.status_code, "detail": error.detail})
+        else:
+            accepted.append((len(results), booking, item.status))
+            results.append(None)
+    
+    if not accepted:
+        return trusted_response({"results": results})
+    
+    changed_at = datetime.now(timezone.utc).isoformat()
+    operations = [UpdateOne(*status_update(booking, status, changed_at)) for _, booking, status in accepted]
+    try:
+        result = await db.bookings.bulk_write(operations, ordered=False)
+        all_applied = result.matched_count == len(operations)
+    except BulkWriteError as e:
+        logger.error(f"Bulk status update partially failed: {str(e.details.get('writeErrors', [])[:1])}")
+        all_applied = False
+    
+    # Bulk results only give counts; when some filters missed, read back
+    # which bookings carry this request's change
+    applied = None
+    if not all_applied:
+        applied = set()
+        async for booking in db.bookings.find(
+            {"id": {"$in": [booking["id"] for _, booking, _ in accepted]}},
+            {"_id": 0, "id": 1, "version": 1, "status_changed_at": 1}
+        ):
+            applied.add((booking["id"], booking["version"], booking.get("status_changed_at")))
+    
+    changed = []
+    for index, booking, status in accepted:
+        after = {**booking, "status": status.value, "version": booking["version"] + 1}
+        if applied is None or (booking["id"], after["version"], changed_at) in applied:
+            changed.append((booking, after))
+            results[index] = {"id": booking["id"], "status_code": 200, "booking": trusted_booking(after)}
+        else:
+            results[index] = {"id": booking["id"], "status_code": 409, "detail": "Agendamento foi alterado, tente novamente"}
+    
+    if changed:
+        await apply_status_changes(changed)
+    return trusted_response({"results": results})
 
 @api_router.patch("/bookings/{booking_id}", response_model=Booking)
 async def update_booking(booking_id: str, update_data: BookingUpdate):
+    # Archived bookings are final, so they are found only to be refused
+    current = await archiver.find_one({"id": booking_id}, BOOKING_PROJECTION)
+    if not current:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    
+    error = transition_error(current, update_data)
+    if error:
+        raise error
+    
+    query, update = status_update(current, update_data.status, datetime.now(timezone.utc).isoformat())
     result = await db.bookings.find_one_and_update(
-        {"id": booking_id},
-        {"$set": {"status": update_data.status}},
-        return_document=True
+        query,
+        update,
+        projection=BOOKING_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
-    
     if not result:
-        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+        raise HTTPException(status_code=409, detail="Agendamento foi alterado, tente novamente")
     
-    result.pop("_id", None)
-    return Booking(**result)
+    await apply_status_changes([(current, result)])
+    return trusted_response(trusted_booking(result))
 
-@api_router.post("/init-services")
-async def init_services():
-    # Use upsert to prevent duplicates - only insert if service doesn't exist
-    services = [
-        {
-            "id": "lavagem-simples",
-            "name": "Lavagem Simples",
-            "description": "Lavagem externa completa do veículo com produtos de qualidade",
-            "price": 50.00,
-            "duration_minutes": 30,
-            "image_url": "https://images.pexels.com/photos/6872158/pexels-photo-6872158.jpeg"
-        },
-        {
-            "id": "lavagem-detalhada",
-            "name": "Lavagem Detalhada",
-            "description": "Lavagem completa interna e externa com aspiração e limpeza profunda",
-            "price": 120.00,
-            "duration_minutes": 90,
-            "image_url": "https://images.pexels.com/photos/16376825/pexels-photo-16376825.jpeg"
-        },
-        {
-            "id": "revitalizacao-plasticos",
-            "name": "Revitalização dos Plásticos",
-            "description": "Restauração e proteção dos plásticos internos e externos",
-            "price": 80.00,
-            "duration_minutes": 60,
-            "image_url": "https://images.pexels.com/photos/5158181/pexels-photo-5158181.jpeg"
-        },
-        {
-            "id": "higienizacao-estofados",
-            "name": "Higienização Interna nos Estofados",
-            "description": "Limpeza profunda e higienização completa dos estofados com produtos especializados",
-            "price": 150.00,
-            "duration_minutes": 90,
-            "image_url": "https://images.pexels.com/photos/16376825/pexels-photo-16376825.jpeg"
-        }
-    ]
+@api_router.get("/reports")
+async def get_reports(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to")
+):
+    """Daily rollups for a date range plus totals, revenue per service and cancellation rate"""
+    try:
+        first = Date.fromisoformat(date_from)
+        last = Date.fromisoformat(date_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida")
     
-    # Use upsert for each service to prevent duplicates
-    from pymongo import UpdateOne
-    operations = [
-        UpdateOne(
-            {"id": service["id"]},
-            {"$set": service},
-            upsert=True
+    days_count = (last - first).days + 1
+    if days_count < 1 or days_count > REPORTS_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Intervalo deve ter entre 1 e {REPORTS_MAX_DAYS} dias"
         )
-        for service in services
-    ]
     
-    if operations:
-        await db.services.bulk_write(operations)
-    
-    return {"message": "Serviços inicializados com sucesso", "count": len(services)}
+    days = await reports.get_range(first.isoformat(), last.isoformat())
+    return trusted_response({"days": days, "totals": summarize(days)})
+
+@api_router.post("/init-services")
+async def init_services():
+    # Seeding runs as a startup migration, before any request is served
+    return {"message": "Serviços inicializados com sucesso", "count": len(SERVICE_CATALOG)}
 
 class NotificationConfig(BaseModel):
     owner_email: str
     owner_whatsapp: str = "+5521992739496"
-    smtp_user: str
-    smtp_password: str
+    # Leave both empty for servers that accept mail without logging in
+    smtp_user: str = ""
+    smtp_password: str = ""
     smtp_server: str = "smtp.gmail.com"
     smtp_port: str = "587"
+    smtp_starttls: bool = True
+    # Sender address; defaults to smtp_user
+    from_email: str = ""
 
 @api_router.get("/notification-config")
 async def get_notification_config():
     """Get current notification configuration status"""
-    owner_email = os.environ.get('OWNER_EMAIL', '')
-    smtp_user = os.environ.get('SMTP_USER', '')
+    config = notification_config.snapshot()
+    owner_email = config.get('owner_email')
+    smtp_user = config.get('smtp_user')
     
     return {
-        "email_configured": bool(owner_email and smtp_user),
+        "email_configured": bool(owner_email and (smtp_user or config.get('from_email'))),
         "owner_email": owner_email if owner_email else None,
         "smtp_user": smtp_user if smtp_user else None,
-        "owner_whatsapp": os.environ.get('OWNER_WHATSAPP', '+5521992739496')
+        "owner_whatsapp": config.get('owner_whatsapp'),
+        "version": config.version
     }
 
 @api_router.post("/notification-config")
-async def save_notification_config(config: NotificationConfig, background_tasks: BackgroundTasks):
-    """Save notification configuration to .env file"""
+async def save_notification_config(config: NotificationConfig):
+    """Save notification configuration; it applies immediately to every worker"""
     try:
-        env_path = ROOT_DIR / '.env'
-        
-        # Read current .env
-        env_lines = []
-        if env_path.exists():
-            with open(env_path, 'r') as f:
-                env_lines = f.readlines()
-        
-        # Update or add configuration
-        config_keys = {
-            'OWNER_EMAIL': config.owner_email,
-            'OWNER_WHATSAPP': config.owner_whatsapp,
-            'SMTP_USER': config.smtp_user,
-            'SMTP_PASSWORD': config.smtp_password,
-            'SMTP_SERVER': config.smtp_server,
-            'SMTP_PORT': config.smtp_port,
-            'FROM_EMAIL': config.smtp_user
-        }
-        
-        # Create updated lines
-        updated_keys = set()
-        new_lines = []
-        
-        for line in env_lines:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                new_lines.append(line)
-                continue
-            
-            key = line.split('=')[0].strip()
-            if key in config_keys:
-                new_lines.append(f'{key}="{config_keys[key]}"')
-                updated_keys.add(key)
-            else:
-                new_lines.append(line)
-        
-        # Add missing keys
-        for key, value in config_keys.items():
-            if key not in updated_keys:
-                new_lines.append(f'{key}="{value}"')
-        
-        # Write back to .env
-        with open(env_path, 'w') as f:
-            f.write('\n'.join(new_lines) + '\n')
-        
-        logger.info("Notification configuration updated successfully")
-        
-        # Schedule backend restart in background
-        def restart_backend():
-            import subprocess
-            import time
-            time.sleep(1)
-            subprocess.run(['sudo', 'supervisorctl', 'restart', 'backend'])
-        
-        background_tasks.add_task(restart_backend)
-        
-        return {"message": "Configuração salva com sucesso. Backend será reiniciado.", "success": True}
-        
+        snapshot = await notification_config.save({
+            "owner_email": config.owner_email,
+            "owner_whatsapp": config.owner_whatsapp,
+            "smtp_user": config.smtp_user,
+            "smtp_password": config.smtp_password,
+            "smtp_server": config.smtp_server,
+            "smtp_port": config.smtp_port,
+            "smtp_starttls": "true" if config.smtp_starttls else "false",
+            "from_email": config.from_email or config.smtp_user
+        })
     except Exception as e:
         logger.error(f"Error saving notification config: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao salvar configuração: {str(e)}")
+    
+    logger.info(f"Notification configuration updated to version {snapshot.version}")
+    return {"message": "Configuração salva com sucesso.", "success": True, "version": snapshot.version}
 
-app.include_router(api_router)
+async def ensure_indexes():
+    """Create the declared indexes; existing identical indexes are a no-op"""
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {collection}: {str(e)}")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+async def build_index_report():
+    """Compare declared indexes with the server and flag missing or unused ones"""
+    report = {}
+    for collection, indexes in INDEXES.items():
+        declared = {index.document["name"] for index in indexes}
+        existing = set((await db[collection].index_information()).keys())
+        
+        usage = {}
+        try:
+            async for stat in db[collection].aggregate([{"$indexStats": {}}]):
+                usage[stat["name"]] = stat["accesses"]["ops"]
+        except OperationFailure as e:
+            logger.warning(f"$indexStats unavailable for {collection}: {str(e)}")
+        
+        report[collection] = {
+            "missing": sorted(declared - existing),
+            "unused": sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+            "undeclared": sorted(existing - declared - {"_id_"}),
+            "usage": usage
+        }
+    return report
+
+@api_router.get("/index-report")
+async def get_index_report():
+    """Report declared indexes that are missing or never used since server start"""
+    return await build_index_report()
+
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    try:
+        NOTIFICATION_QUEUE_DEPTH.set(await outbox.depth())
+    except Exception as e:
+        logger.warning(f"Failed to measure notification queue depth: {str(e)}")
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -492,6 +1426,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+async def prepare_database():
+    await ensure_indexes()
+    await run_migrations()
+    
+    # The report is advisory; a server that can't produce it must still boot
+    try:
+        report = await build_index_report()
+    except Exception as e:
+        logger.warning(f"Index report unavailable: {str(e)}")
+        return
+    for collection, entry in report.items():
+        if entry["missing"]:
+            logger.warning(f"Missing indexes on {collection}: {', '.join(entry['missing'])}")
+        if entry["unused"]:
+            logger.info(f"Unused indexes on {collection}: {', '.join(entry['unused'])}")
+
+async def start_background_workers():
+    await notification_config.load()
+    # Warm the catalog so the first requests don't all queue on its reload
+    await catalog.get_all()
+    notification_config.start()
+    outbox.start()
+    booking_events.start(db.bookings)
+    if archiver.max_age_days > 0:
+        archiver.start()
+    if reminders.lead_seconds > 0:
+        reminders.start(booking_events)
+
+# Set once this process has prepared the database and started its workers
+started = False
+start_lock: Optional[asyncio.Lock] = None
+
+async def start_process():
+    """Connect, prepare the database and start the background workers, once per process"""
+    global started, start_lock
+    if start_lock is None:
+        start_lock = asyncio.Lock()
+    async with start_lock:
+        if started:
+            return
+        connect()
+        await prepare_database()
+        await start_background_workers()
+        started = True
+
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    global client, started
+    await outbox.stop()
+    await booking_events.stop()
+    await archiver.stop()
+    await reminders.stop()
+    await notification_config.stop()
+    if smtp_pool:
+        await smtp_pool.close()
+    client.close()
+    client = None
+    started = False
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_process()
+    yield
+    await shutdown_db_client()
+
+def create_app() -> FastAPI:
+    """Build the ASGI app; each worker connects to MongoDB in its own lifespan"""
+    load_dotenv(ROOT_DIR / '.env')
+    
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api_router)
+    app.add_api_route("/metrics", get_metrics, methods=["GET"], include_in_schema=False)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Added last so it wraps everything, including CORS preflights
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+# Entry point for uvicorn, gunicorn and Vercel
+app = create_app()
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Pool of persistent, authenticated SMTP connections"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.message import Message
+from typing import List, Optional
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+class _Connection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+
+class SMTPPool:
+    """Keeps up to ``size`` SMTP sessions open and hands them out to senders.
+
+    Connections that sat idle longer than ``idle_check_seconds`` are probed
+    with NOOP before reuse and reopened if the server dropped them. Point it
+    at a local stand-in such as ``python -m aiosmtpd -n -l localhost:8025``
+    with ``start_tls=False`` and no credentials to exercise it offline.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str = "",
+        password: str = "",
+        start_tls: bool = True,
+        use_tls: bool = False,
+        size: int = 3,
+        idle_check_seconds: float = 30,
+        timeout: float = 30
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+        self.idle_check_seconds = idle_check_seconds
+        self.timeout = timeout
+        self._idle: List[_Connection] = []
+        self._slots = asyncio.Semaphore(size)
+        self._closed = False
+
+    async def _open(self) -> _Connection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls if not self.use_tls else False,
+            timeout=self.timeout
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        return _Connection(smtp)
+
+    async def _is_healthy(self, connection: _Connection) -> bool:
+        if not connection.smtp.is_connected:
+            return False
+        if time.monotonic() - connection.last_used < self.idle_check_seconds:
+            return True
+        try:
+            await connection.smtp.noop()
+            return True
+        except aiosmtplib.SMTPException:
+            return False
+
+    @staticmethod
+    async def _discard(connection: _Connection):
+        try:
+            await connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a healthy connection; it is returned to the pool unless it failed"""
+        if self._closed:
+            raise RuntimeError("SMTP pool is closed")
+
+        async with self._slots:
+            connection = None
+            while self._idle and connection is None:
+                candidate = self._idle.pop()
+                if await self._is_healthy(candidate):
+                    connection = candidate
+                else:
+                    await self._discard(candidate)
+            if connection is None:
+                connection = await self._open()
+
+            try:
+                yield connection.smtp
+            except BaseException:
+                # The session state is unknown after an error; don't reuse it
+                await self._discard(connection)
+                raise
+            else:
+                connection.last_used = time.monotonic()
+                if self._closed:
+                    await self._discard(connection)
+                else:
+                    self._idle.append(connection)
+
+    async def send(self, message: Message):
+        async with self.connection() as smtp:
+            await smtp.send_message(message)
+
+    async def send_batch(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """Send messages over one session; returns None or the error for each message"""
+        results: List[Optional[Exception]] = []
+        try:
+            async with self.connection() as smtp:
+                for message in messages:
+                    try:
+                        await smtp.send_message(message)
+                        results.append(None)
+                    except (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPResponseException) as e:
+                        # Only this message was rejected; keep the session
+                        results.append(e)
+        except Exception as e:
+            # The session broke; everything not yet attempted failed with it
+            results.extend([e] * (len(messages) - len(results)))
+        return results
+
+    async def close(self):
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await self._discard(connection)
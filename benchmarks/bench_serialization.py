@@ -0,0 +1,69 @@
+"""Benchmark serializing a page of bookings for the read endpoints.
+
+Compares FastAPI validating the documents against the response_model and
+encoding them with json, to trusted_response sending the projected
+documents straight to orjson.
+
+Usage: python benchmarks/bench_serialization.py [rows]
+"""
+import asyncio
+import sys
+import timeit
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+import server  # noqa: E402
+
+def make_bookings(rows):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "service_id": "lavagem-detalhada",
+            "service_name": "Lavagem Detalhada",
+            "customer_name": f"Cliente {index}",
+            "customer_phone": "+55 21 99999-0000",
+            "customer_email": f"cliente{index}@example.com",
+            "vehicle_model": "Onix",
+            "vehicle_plate": "ABC-1D23",
+            "date": "2030-01-15",
+            "time": "09:00",
+            "status": "pending",
+            "created_at": f"2030-01-01T12:00:{index % 60:02d}.000000+00:00",
+            "duration_minutes": 60,
+        }
+        for index in range(rows)
+    ]
+
+def render_validated(loop, field, page):
+    # What a route returning plain dicts costs: validate, dump, json.dumps
+    content = loop.run_until_complete(serialize_response(field=field, response_content=page))
+    return JSONResponse(content).body
+
+def render_trusted(page):
+    items = [server.trusted_booking(booking) for booking in page["items"]]
+    return server.trusted_response({"items": items, "next_cursor": page["next_cursor"]}).body
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    page = {"items": make_bookings(rows), "next_cursor": None}
+    field = create_response_field(name="Response_get_bookings", type_=server.BookingPage, mode="serialization")
+    loop = asyncio.new_event_loop()
+    number = max(1, 20000 // rows)
+
+    for label, func in [
+        ("response_model", lambda: render_validated(loop, field, page)),
+        ("trusted", lambda: render_trusted(page)),
+    ]:
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{label:>14}: {seconds / number / rows * 1e6:8.2f} us per row ({rows} rows per page)")
+    loop.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark notification template rendering.
+
+Usage: python benchmarks/bench_templates.py [iterations]
+"""
+import html
+import sys
+import timeit
+from pathlib import Path
+from string import Template
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from notification_templates import NotificationTemplates  # noqa: E402
+
+TEMPLATE_DIR = BACKEND_DIR / "templates" / "notifications"
+
+BOOKING = {
+    "id": "6f1c2a5e-2d7b-4a53-9d7e-0c6f3f4f8a21",
+    "service_name": "Lavagem Detalhada",
+    "customer_name": "Maria <Silva> & Filhos",
+    "customer_phone": "+55 21 99999-0000",
+    "customer_email": "maria@example.com",
+    "vehicle_model": "Onix",
+    "vehicle_plate": "ABC-1D23",
+    "date": "2030-01-15",
+    "date_formatted": "15/01/2030",
+    "time": "09:00",
+    "address": "RUA JUIZ JACOB GOLDEMBERG, 4",
+}
+
+FAMILIES = ["booking_created_owner", "booking_created_customer"]
+CHANNELS = ["subject", "html", "text", "whatsapp"]
+
+def render_compiled(templates):
+    for family in FAMILIES:
+        for channel in CHANNELS:
+            templates.render(family, channel, BOOKING)
+
+def render_parsed(sources):
+    # Baseline: parse every template on each render, as inline formatting does
+    escaped = {key: html.escape(value) for key, value in BOOKING.items()}
+    for (family, channel), source in sources.items():
+        Template(source).substitute(escaped if channel == "html" else BOOKING)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    templates = NotificationTemplates(TEMPLATE_DIR)
+    sources = {
+        (family, channel): (TEMPLATE_DIR / f"{family}.pt_BR.{channel}").read_text(encoding="utf-8")
+        for family in FAMILIES
+        for channel in CHANNELS
+    }
+
+    for label, func, arg in [("compiled", render_compiled, templates), ("parsed per call", render_parsed, sources)]:
+        seconds = min(timeit.repeat(lambda: func(arg), number=iterations, repeat=3))
+        print(f"{label:>16}: {seconds / iterations * 1e6:8.2f} us per booking ({len(FAMILIES) * len(CHANNELS)} renders)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Load test for the booking API.
+
+Boots the app in process and drives concurrent booking, timeslot and listing
+traffic through httpx, then reports latency percentiles, throughput and how
+many slots ended up booked beyond capacity.
+
+Against a local mongod (a throwaway database is created and dropped):
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/load_test.py
+
+Without MONGO_URL the app runs on mongomock-motor, which is enough to catch
+regressions in the request path but not in query plans:
+
+    python benchmarks/load_test.py --concurrency 50 --bookings 400 --reads 2000
+
+Exits with status 1 if any slot was double-booked.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=20, help="simultaneous clients")
+    parser.add_argument("--bookings", type=int, default=200, help="booking attempts")
+    parser.add_argument("--reads", type=int, default=1000, help="timeslot and listing requests")
+    parser.add_argument("--days", type=int, default=3, help="days the bookings are spread over; fewer days means more contention")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+def load_app():
+    """Import the server against MONGO_URL, or mongomock-motor when it is unset"""
+    os.environ["DB_NAME"] = f"bench_{uuid4().hex[:8]}"
+    # All traffic comes from one address; set RATE_LIMIT_BACKEND to measure the limiter too
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+    if not os.environ.get("MONGO_URL"):
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+
+        os.environ["MONGO_URL"] = "mongodb://mongomock"
+        motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+    import server
+    return server
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def call(self, client, name, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][response.status_code] += 1
+        return response
+
+    def report(self, elapsed):
+        print(f"{'endpoint':<18}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}  statuses")
+        for name, samples in sorted(self.latencies.items()):
+            print(
+                f"{name:<18}{len(samples):>7}"
+                f"{percentile(samples, 50) * 1000:>9.1f}"
+                f"{percentile(samples, 95) * 1000:>9.1f}"
+                f"{percentile(samples, 99) * 1000:>9.1f}"
+                f"{len(samples) / elapsed:>9.0f}  "
+                + ", ".join(f"{code}x{count}" for code, count in sorted(self.statuses[name].items()))
+            )
+        total = sum(len(samples) for samples in self.latencies.values())
+        print(f"\n{total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+
+def percentile(samples, p):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+def booking_payload(service_id, day, time_):
+    suffix = uuid4().hex[:6]
+    return {
+        "service_id": service_id,
+        "customer_name": f"Cliente {suffix}",
+        "customer_phone": f"+55 21 9{random.randint(10000000, 99999999)}",
+        "customer_email": f"cliente-{suffix}@example.com",
+        "vehicle_model": "Onix",
+        "vehicle_plate": f"BNC{random.randint(1000, 9999)}",
+        "date": day,
+        "time": time_
+    }
+
+async def run(args):
+    random.seed(args.seed)
+    server = load_app()
+    from availability import START_TIMES
+
+    recorder = Recorder()
+    first_day = date.today() + timedelta(days=7)
+    days = [(first_day + timedelta(days=offset)).isoformat() for offset in range(args.days)]
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            services = (await client.get("/api/services")).json()
+
+            jobs = [
+                ("create_booking", "POST", "/api/bookings", {
+                    "json": booking_payload(random.choice(services)["id"], random.choice(days), random.choice(START_TIMES))
+                })
+                for _ in range(args.bookings)
+            ]
+            for _ in range(args.reads):
+                if random.random() < 0.7:
+                    jobs.append(("timeslots", "GET", "/api/timeslots", {
+                        "params": {"date": random.choice(days), "service_id": random.choice(services)["id"]}
+                    }))
+                else:
+                    jobs.append(("list_bookings", "GET", "/api/bookings", {"params": {"limit": 50}}))
+            random.shuffle(jobs)
+
+            queue = asyncio.Queue()
+            for job in jobs:
+                queue.put_nowait(job)
+
+            async def worker():
+                while not queue.empty():
+                    name, method, url, kwargs = queue.get_nowait()
+                    await recorder.call(client, name, method, url, **kwargs)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+
+        try:
+            overbooked = await count_overbooked_cells(server, days)
+        finally:
+            await server.client.drop_database(os.environ["DB_NAME"])
+
+    recorder.report(elapsed)
+    print(f"Double-booked 15-minute cells: {overbooked}")
+    return overbooked
+
+async def count_overbooked_cells(server, days):
+    """Recount occupancy from the bookings themselves and compare with capacity"""
+    engine = server.availability
+    usage = Counter()
+    async for booking in server.db.bookings.find(
+        {"date": {"$in": days}, "status": {"$in": [status.value for status in server.ACTIVE_STATUSES]}}
+    ):
+        cells = engine.cells_for(booking["time"], await server.booking_duration(booking)) or []
+        for cell in cells:
+            usage[(booking["date"], cell)] += 1
+    return sum(1 for count in usage.values() if count > engine.capacity)
+
+def main():
+    args = parse_args()
+    logging.disable(logging.WARNING)
+    overbooked = asyncio.run(run(args))
+    sys.exit(1 if overbooked else 0)
+
+if __name__ == "__main__":
+    main()
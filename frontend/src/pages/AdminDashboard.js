@@ -1,29 +1,108 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { toast } from 'sonner';
-import { ArrowLeft, Calendar, Clock, Car, User, Filter, CheckCircle, XCircle, Circle, Bell } from 'lucide-react';
+import { ArrowLeft, Calendar, Clock, Car, User, Filter, CheckCircle, XCircle, Circle, Bell, Download, Search } from 'lucide-react';
 import { motion } from 'framer-motion';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Days before and after today covered by the summary cards
+const STATS_DAYS_BACK = 30;
+const STATS_DAYS_AHEAD = 60;
+
+// Pause after typing before searching by phone or plate
+const SEARCH_DEBOUNCE_MS = 300;
+
+// Booking events refresh the summary cards at most once per this interval,
+// so a busy day doesn't turn every open tab into a stream of report requests
+const STATS_REFRESH_INTERVAL_MS = 5000;
+
+// Most status changes the server accepts in one bulk request
+const BULK_UPDATE_MAX_ITEMS = 200;
+
+const isoDate = (offsetDays) => {
+  const date = new Date();
+  date.setDate(date.getDate() + offsetDays);
+  return date.toISOString().split('T')[0];
+};
+
 const AdminDashboard = () => {
   const navigate = useNavigate();
   const [bookings, setBookings] = useState([]);
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all');
   const [expandedId, setExpandedId] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [totals, setTotals] = useState(null);
+  const [search, setSearch] = useState('');
+  const statsTimer = useRef(null);
+
+  useEffect(() => {
+    if (!search.trim()) {
+      fetchBookings();
+      return;
+    }
+    const timer = setTimeout(searchBookings, SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [filter, search]);
 
   useEffect(() => {
-    fetchBookings();
+    fetchStats();
+  }, []);
+
+  useEffect(() => {
+    const matchesFilter = (booking) => filter === 'all' || booking.status === filter;
+    const source = new EventSource(`${API}/bookings/events`);
+
+    source.addEventListener('booking.created', (e) => {
+      const booking = JSON.parse(e.data);
+      if (!matchesFilter(booking)) return;
+      setBookings(prev => prev.some(b => b.id === booking.id) ? prev : [booking, ...prev]);
+      scheduleStatsRefresh();
+    });
+
+    source.addEventListener('booking.updated', (e) => {
+      const booking = JSON.parse(e.data);
+      setBookings(prev => {
+        const known = prev.some(b => b.id === booking.id);
+        if (!matchesFilter(booking)) return prev.filter(b => b.id !== booking.id);
+        return known ? prev.map(b => b.id === booking.id ? booking : b) : prev;
+      });
+      scheduleStatsRefresh();
+    });
+
+    // The server lost track of this feed; start over from the first page
+    source.addEventListener('resync', () => {
+      fetchBookings();
+      fetchStats();
+    });
+
+    return () => {
+      source.close();
+      clearTimeout(statsTimer.current);
+      statsTimer.current = null;
+    };
   }, [filter]);
 
-  const fetchBookings = async () => {
+  const scheduleStatsRefresh = () => {
+    if (statsTimer.current) return;
+    statsTimer.current = setTimeout(() => {
+      statsTimer.current = null;
+      fetchStats();
+    }, STATS_REFRESH_INTERVAL_MS);
+  };
+
+  const fetchBookings = async (cursor = null) => {
     try {
-      const url = filter === 'all' ? `${API}/bookings` : `${API}/bookings?status=${filter}`;
-      const response = await axios.get(url);
-      setBookings(response.data);
+      const params = {};
+      if (filter !== 'all') params.status = filter;
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API}/bookings`, { params });
+      setBookings(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Erro ao carregar agendamentos:', error);
       toast.error('Erro ao carregar agendamentos');
@@ -32,14 +111,76 @@ const AdminDashboard = () => {
     }
   };
 
-  const updateBookingStatus = async (bookingId, newStatus) => {
+  const searchBookings = async () => {
+    const term = search.trim();
+    // Plates have letters; anything else is taken as a phone number
+    const params = /[a-z]/i.test(term) ? { plate: term } : { phone: term };
+    try {
+      const response = await axios.get(`${API}/bookings/search`, { params });
+      setBookings(response.data.filter(b => filter === 'all' || b.status === filter));
+      setNextCursor(null);
+    } catch (error) {
+      // 400 only means the prefix is still too short
+      if (error.response?.status !== 400) {
+        console.error('Erro ao buscar agendamentos:', error);
+        toast.error('Erro ao buscar agendamentos');
+      }
+    }
+  };
+
+  const fetchStats = async () => {
+    try {
+      const params = { from: isoDate(-STATS_DAYS_BACK), to: isoDate(STATS_DAYS_AHEAD) };
+      const response = await axios.get(`${API}/reports`, { params });
+      setTotals(response.data.totals);
+    } catch (error) {
+      console.error('Erro ao carregar resumo:', error);
+    }
+  };
+
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchBookings(nextCursor);
+    setLoadingMore(false);
+  };
+
+  const updateBookingStatus = async (booking, newStatus) => {
     try {
-      await axios.patch(`${API}/bookings/${bookingId}`, { status: newStatus });
+      const response = await axios.patch(`${API}/bookings/${booking.id}`, { status: newStatus, version: booking.version });
       toast.success('Status atualizado com sucesso!');
-      fetchBookings();
+      setBookings(prev => prev
+        .map(b => b.id === booking.id ? response.data : b)
+        .filter(b => filter === 'all' || b.status === filter));
     } catch (error) {
       console.error('Erro ao atualizar status:', error);
-      toast.error('Erro ao atualizar status');
+      toast.error(error.response?.data?.detail || 'Erro ao atualizar status');
+    }
+  };
+
+  // Confirmed bookings up to today, closed together at the end of the day
+  const closable = bookings.filter(b => b.status === 'confirmed' && b.date <= isoDate(0));
+
+  const completeConfirmed = async () => {
+    const items = closable
+      .slice(0, BULK_UPDATE_MAX_ITEMS)
+      .map(b => ({ id: b.id, status: 'completed', version: b.version }));
+    try {
+      const response = await axios.patch(`${API}/bookings:bulk`, { items });
+      const updated = Object.fromEntries(response.data.results
+        .filter(result => result.status_code === 200)
+        .map(result => [result.id, result.booking]));
+      const count = Object.keys(updated).length;
+      setBookings(prev => prev
+        .map(b => updated[b.id] || b)
+        .filter(b => filter === 'all' || b.status === filter));
+      if (count < items.length) {
+        toast.error(`${items.length - count} agendamento(s) não puderam ser concluídos`);
+      } else {
+        toast.success(`${count} agendamento(s) concluído(s)`);
+      }
+    } catch (error) {
+      console.error('Erro ao concluir agendamentos:', error);
+      toast.error('Erro ao concluir agendamentos');
     }
   };
 
@@ -64,10 +205,10 @@ const AdminDashboard = () => {
   };
 
   const stats = {
-    total: bookings.length,
-    pending: bookings.filter(b => b.status === 'pending').length,
-    confirmed: bookings.filter(b => b.status === 'confirmed').length,
-    completed: bookings.filter(b => b.status === 'completed').length
+    total: totals?.bookings ?? 0,
+    pending: totals?.status?.pending ?? 0,
+    confirmed: totals?.status?.confirmed ?? 0,
+    completed: totals?.status?.completed ?? 0
   };
 
   return (
@@ -94,19 +235,49 @@ const AdminDashboard = () => {
           <h1 className="text-4xl font-bold mb-2" style={{ color: '#f4f4f5' }}>Painel Administrativo</h1>
           <div className="flex items-center justify-between">
             <p style={{ color: '#a1a1aa' }}>Gerencie todos os agendamentos</p>
-            <button
-              onClick={() => navigate('/admin/notificacoes')}
-              data-testid="notification-setup-button"
-              className="flex items-center gap-2 px-4 py-2 rounded-full text-sm font-medium"
-              style={{
-                background: 'rgba(59, 130, 246, 0.1)',
-                border: '1px solid rgba(59, 130, 246, 0.3)',
-                color: '#3b82f6'
-              }}
-            >
-              <Bell size={16} />
-              Configurar Notificações
-            </button>
+            <div className="flex items-center gap-3">
+              {closable.length > 0 && (
+                <button
+                  onClick={completeConfirmed}
+                  data-testid="complete-confirmed-button"
+                  className="flex items-center gap-2 px-4 py-2 rounded-full text-sm font-medium"
+                  style={{
+                    background: 'rgba(34, 197, 94, 0.1)',
+                    border: '1px solid rgba(34, 197, 94, 0.3)',
+                    color: '#22c55e'
+                  }}
+                >
+                  <CheckCircle size={16} />
+                  Concluir confirmados até hoje ({closable.length})
+                </button>
+              )}
+              <a
+                href={`${API}/bookings/export?format=csv${filter !== 'all' ? `&status=${filter}` : ''}`}
+                data-testid="export-csv-button"
+                className="flex items-center gap-2 px-4 py-2 rounded-full text-sm font-medium"
+                style={{
+                  background: 'rgba(255, 255, 255, 0.05)',
+                  border: '1px solid rgba(255, 255, 255, 0.1)',
+                  color: '#f4f4f5'
+                }}
+              >
+                <Download size={16} />
+                Exportar CSV
+              </a>
+              <button
+                onClick={() => navigate('/admin/notificacoes')}
+                data-testid="notification-setup-button"
+                className="flex items-center gap-2 px-4 py-2 rounded-full text-sm font-medium"
+                style={{
+                  background: 'rgba(59, 130, 246, 0.1)',
+                  border: '1px solid rgba(59, 130, 246, 0.3)',
+                  color: '#3b82f6'
+                }}
+              >
+                <Bell size={16} />
+                Configurar Notificações
+              </button>
+            </div>
           </div>
         </div>
 
@@ -159,6 +330,22 @@ const AdminDashboard = () => {
               </button>
             ))}
           </div>
+          <div className="relative mt-6">
+            <Search size={18} className="absolute left-4 top-1/2 -translate-y-1/2" style={{ color: '#a1a1aa' }} />
+            <input
+              type="search"
+              value={search}
+              onChange={(e) => setSearch(e.target.value)}
+              placeholder="Buscar por telefone ou placa"
+              data-testid="booking-search-input"
+              className="w-full h-12 pl-11 pr-4 rounded-lg"
+              style={{
+                background: 'rgba(0, 0, 0, 0.2)',
+                border: '1px solid rgba(255, 255, 255, 0.1)',
+                color: '#f4f4f5'
+              }}
+            />
+          </div>
         </div>
 
         {loading ? (
@@ -256,7 +443,7 @@ const AdminDashboard = () => {
                         {booking.status === 'pending' && (
                           <>
                             <button
-                              onClick={() => updateBookingStatus(booking.id, 'confirmed')}
+                              onClick={() => updateBookingStatus(booking, 'confirmed')}
                               data-testid={`confirm-button-${booking.id}`}
                               className="flex items-center gap-2 px-6 py-2 rounded-full font-medium text-sm"
                               style={{ background: '#22c55e', color: '#ffffff' }}
@@ -265,7 +452,7 @@ const AdminDashboard = () => {
                               Confirmar
                             </button>
                             <button
-                              onClick={() => updateBookingStatus(booking.id, 'cancelled')}
+                              onClick={() => updateBookingStatus(booking, 'cancelled')}
                               data-testid={`cancel-button-${booking.id}`}
                               className="flex items-center gap-2 px-6 py-2 rounded-full font-medium text-sm"
                               style={{ background: 'rgba(239, 68, 68, 0.2)', border: '1px solid #ef4444', color: '#ef4444' }}
@@ -277,7 +464,7 @@ const AdminDashboard = () => {
                         )}
                         {booking.status === 'confirmed' && (
                           <button
-                            onClick={() => updateBookingStatus(booking.id, 'completed')}
+                            onClick={() => updateBookingStatus(booking, 'completed')}
                             data-testid={`complete-button-${booking.id}`}
                             className="flex items-center gap-2 px-6 py-2 rounded-full font-medium text-sm"
                             style={{ background: '#3b82f6', color: '#ffffff' }}
@@ -292,6 +479,23 @@ const AdminDashboard = () => {
                 )}
               </motion.div>
             ))}
+            {nextCursor && (
+              <div className="text-center pt-4">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  data-testid="load-more-button"
+                  className="px-6 py-2 rounded-full font-medium text-sm"
+                  style={{
+                    background: 'rgba(255, 255, 255, 0.05)',
+                    border: '1px solid rgba(255, 255, 255, 0.1)',
+                    color: '#f4f4f5'
+                  }}
+                >
+                  {loadingMore ? 'Carregando...' : 'Carregar mais'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import axios from 'axios';
 import { toast } from 'sonner';
@@ -8,12 +8,23 @@ import { motion, AnimatePresence } from 'framer-motion';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Attempts made when the connection drops before the server answers
+const SUBMIT_ATTEMPTS = 3;
+const SUBMIT_TIMEOUT_MS = 15000;
+
+const newIdempotencyKey = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
 const BookingForm = () => {
   const navigate = useNavigate();
   const location = useLocation();
   const [step, setStep] = useState(1);
   const [services, setServices] = useState([]);
   const [timeSlots, setTimeSlots] = useState([]);
+  const [calendarDays, setCalendarDays] = useState([]);
   const [loading, setLoading] = useState(false);
 
   const [formData, setFormData] = useState({
@@ -27,6 +38,17 @@ const BookingForm = () => {
     time: ''
   });
 
+  // Same key for every retry of the same form data, so the server books once
+  const idempotencyKey = useRef(null);
+  useEffect(() => {
+    idempotencyKey.current = null;
+  }, [formData]);
+
+  const today = new Date().toISOString().split('T')[0];
+  const maxDate = new Date();
+  maxDate.setDate(maxDate.getDate() + 60);
+  const maxDateStr = maxDate.toISOString().split('T')[0];
+
   useEffect(() => {
     const fetchServices = async () => {
       try {
@@ -41,18 +63,55 @@ const BookingForm = () => {
   }, []);
 
   useEffect(() => {
-    if (formData.date) {
-      fetchTimeSlots(formData.date);
+    if (formData.service_id) {
+      fetchAvailability(formData.service_id);
     }
-  }, [formData.date]);
+  }, [formData.service_id]);
 
-  const fetchTimeSlots = async (date) => {
+  // Day whose timeslots are wanted, so a slow answer for another day is ignored
+  const selectedDay = useRef('');
+
+  useEffect(() => {
+    if (!formData.date) return;
+    // The calendar's copy shows at once; the day is then fetched fresh, as
+    // slots may have been taken since the calendar loaded
+    const day = calendarDays.find(d => d.date === formData.date);
+    if (day) setTimeSlots(day.timeslots);
+    fetchTimeSlots(formData.date, formData.service_id);
+  }, [formData.date, formData.service_id]);
+
+  const fetchAvailability = async (serviceId) => {
+    try {
+      const response = await axios.get(`${API}/availability`, {
+        params: { from: today, to: maxDateStr, service_id: serviceId }
+      });
+      setCalendarDays(response.data);
+    } catch (error) {
+      console.error('Erro ao carregar disponibilidade:', error);
+      setCalendarDays([]);
+    }
+  };
+
+  const fetchTimeSlots = async (date, serviceId) => {
+    const requested = `${date}|${serviceId}`;
+    selectedDay.current = requested;
     try {
-      const response = await axios.get(`${API}/timeslots?date=${date}`);
-      setTimeSlots(response.data);
+      const params = { date };
+      if (serviceId) params.service_id = serviceId;
+      const response = await axios.get(`${API}/timeslots`, { params });
+      if (selectedDay.current !== requested) return null;
+      const slots = response.data;
+      setTimeSlots(slots);
+      // Keep the calendar in step with what the day now looks like
+      const availableCount = slots.filter(slot => slot.available).length;
+      setCalendarDays(prev => prev.map(day => day.date === date
+        ? { ...day, timeslots: slots, available_count: availableCount, fully_booked: availableCount === 0 }
+        : day));
+      return slots;
     } catch (error) {
       console.error('Erro ao carregar horários:', error);
       toast.error('Erro ao carregar horários');
+      return null;
     }
   };
 
@@ -66,8 +125,30 @@ const BookingForm = () => {
     
     setLoading(true);
 
+    if (!idempotencyKey.current) {
+      idempotencyKey.current = newIdempotencyKey();
+    }
+
+    const submit = async (attempt) => {
+      try {
+        return await axios.post(`${API}/bookings`, formData, {
+          headers: { 'Idempotency-Key': idempotencyKey.current },
+          timeout: SUBMIT_TIMEOUT_MS
+        });
+      } catch (error) {
+        // No response means the request may or may not have arrived, and 409
+        // means it is still being processed; the key makes retrying safe
+        const retriable = !error.response || error.response.status === 409;
+        if (retriable && attempt < SUBMIT_ATTEMPTS) {
+          await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+          return submit(attempt + 1);
+        }
+        throw error;
+      }
+    };
+
     try {
-      const response = await axios.post(`${API}/bookings`, formData);
+      const response = await submit(1);
       toast.success('Agendamento realizado com sucesso!');
       navigate(`/confirmacao/${response.data.id}`);
     } catch (error) {
@@ -75,6 +156,13 @@ const BookingForm = () => {
       const errorMessage = error.response?.data?.detail || 
                           (typeof error.response?.data === 'string' ? error.response.data : 'Erro ao criar agendamento');
       toast.error(errorMessage);
+      // The slot may have been taken meanwhile; show the day as it is now
+      // and send the customer back to pick another time if it was
+      const slots = await fetchTimeSlots(formData.date, formData.service_id);
+      if (slots && !slots.some(slot => slot.time === formData.time && slot.available)) {
+        setFormData(prev => ({ ...prev, time: '' }));
+        setStep(2);
+      }
     } finally {
       setLoading(false);
     }
@@ -102,11 +190,6 @@ const BookingForm = () => {
 
   const selectedService = services.find(s => s.id === formData.service_id);
 
-  const today = new Date().toISOString().split('T')[0];
-  const maxDate = new Date();
-  maxDate.setDate(maxDate.getDate() + 60);
-  const maxDateStr = maxDate.toISOString().split('T')[0];
-
   return (
     <div className="min-h-screen px-6 py-12" style={{ background: '#09090b' }}>
       <div className="noise-overlay"></div>
@@ -183,7 +266,7 @@ const BookingForm = () => {
                           name="service"
                           value={service.id}
                           checked={formData.service_id === service.id}
-                          onChange={(e) => setFormData({ ...formData, service_id: e.target.value })}
+                          onChange={(e) => setFormData({ ...formData, service_id: e.target.value, time: '' })}
                           className="mt-1"
                           style={{ accentColor: '#3b82f6' }}
                         />
@@ -233,6 +316,34 @@ const BookingForm = () => {
                     />
                   </div>
 
+                  {calendarDays.length > 0 && (
+                    <div className="mb-8" data-testid="availability-calendar">
+                      <label className="block mb-3 font-medium" style={{ color: '#f4f4f5' }}>Próximos dias</label>
+                      <div className="grid grid-cols-7 gap-2">
+                        {calendarDays.slice(0, 28).map((day) => (
+                          <button
+                            key={day.date}
+                            type="button"
+                            disabled={day.fully_booked}
+                            onClick={() => setFormData({ ...formData, date: day.date, time: '' })}
+                            data-testid={`calendar-day-${day.date}`}
+                            title={day.fully_booked ? 'Lotado' : `${day.available_count} horários livres`}
+                            className="py-2 rounded-lg text-xs font-medium"
+                            style={{
+                              background: formData.date === day.date ? '#3b82f6' : day.fully_booked ? 'rgba(239, 68, 68, 0.1)' : 'rgba(255, 255, 255, 0.05)',
+                              border: formData.date === day.date ? '1px solid #3b82f6' : '1px solid rgba(255, 255, 255, 0.1)',
+                              color: day.fully_booked ? '#52525b' : '#f4f4f5',
+                              cursor: day.fully_booked ? 'not-allowed' : 'pointer',
+                              textDecoration: day.fully_booked ? 'line-through' : 'none'
+                            }}
+                          >
+                            {new Date(day.date + 'T00:00:00').toLocaleDateString('pt-BR', { day: '2-digit', month: '2-digit' })}
+                          </button>
+                        ))}
+                      </div>
+                    </div>
+                  )}
+
                   {formData.date && (
                     <div>
                       <label className="block mb-3 font-medium" style={{ color: '#f4f4f5' }}>Horário</label>
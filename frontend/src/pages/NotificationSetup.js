@@ -47,12 +47,8 @@ const NotificationSetup = () => {
 
     try {
       await axios.post(`${API}/notification-config`, config);
-      toast.success('Configurações salvas! Reiniciando backend...');
-      
-      setTimeout(async () => {
-        await fetchCurrentConfig();
-        toast.success('Backend reiniciado! Notificações ativadas.');
-      }, 3000);
+      await fetchCurrentConfig();
+      toast.success('Configurações salvas! Notificações ativadas.');
     } catch (error) {
       console.error('Erro ao salvar configuração:', error);
       toast.error('Erro ao salvar configurações');
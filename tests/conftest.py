@@ -0,0 +1,128 @@
+"""Fixtures running the backend in process on mongomock-motor"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://mongomock")
+os.environ.setdefault("DB_NAME", "test")
+# Tests create many bookings from one address
+os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+
+import mongomock.aggregate  # noqa: E402
+import mongomock.collection  # noqa: E402
+import motor.motor_asyncio  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+from pymongo import ReturnDocument  # noqa: E402
+
+# Every connect() gets an empty database
+motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+
+def _find_and_modify(self, query, projection=None, update=None, upsert=False, sort=None,
+                     return_document=ReturnDocument.BEFORE, session=None, **kwargs):
+    # mongomock looks the updated document up again with the original
+    # filter, so it returns None when the update changed a filtered field
+    # (e.g. version) while the projection drops _id
+    old = self.find_one(query, sort=sort)
+    if old is None and not upsert:
+        return None
+    before = None if old is None else self.find_one({"_id": old["_id"]}, projection)
+    target = query if old is None else {"_id": old["_id"]}
+    if kwargs.get("remove"):
+        self.delete_one(target)
+        return before
+    updated = self._update(target, update, upsert)
+    if updated["upserted"]:
+        target = {"_id": updated["upserted"]}
+    if return_document is ReturnDocument.AFTER or kwargs.get("new"):
+        return self.find_one(target, projection)
+    return before
+
+mongomock.collection.Collection._find_and_modify = _find_and_modify
+
+# mongomock knows neither $$NOW nor date arithmetic, which the rate limiter's
+# pipeline updates rely on
+_parse_basic_expression = mongomock.aggregate._Parser._parse_basic_expression
+_handle_arithmetic_operator = mongomock.aggregate._Parser._handle_arithmetic_operator
+
+def _parse_now(self, expression):
+    if expression == "$$NOW":
+        # Constant within an expression, as MongoDB keeps it for a command
+        if not hasattr(self, "_now"):
+            self._now = datetime.utcnow()
+        return self._now
+    return _parse_basic_expression(self, expression)
+
+def _date_arithmetic(self, operator, values):
+    if operator in ("$add", "$subtract") and isinstance(values, list):
+        parsed = [self.parse(value) for value in values]
+        if any(isinstance(value, datetime) for value in parsed):
+            # As in MongoDB: date - date is milliseconds, date +/- number is a date
+            if operator == "$subtract":
+                first, second = parsed
+                if isinstance(second, datetime):
+                    return (first - second) / timedelta(milliseconds=1)
+                return first - timedelta(milliseconds=second)
+            date = next(value for value in parsed if isinstance(value, datetime))
+            milliseconds = sum(value for value in parsed if not isinstance(value, datetime))
+            return date + timedelta(milliseconds=milliseconds)
+    return _handle_arithmetic_operator(self, operator, values)
+
+mongomock.aggregate._Parser._parse_basic_expression = _parse_now
+mongomock.aggregate._Parser._handle_arithmetic_operator = _date_arithmetic
+
+class UpsertRace:
+    """Collection wrapper letting concurrent upserts miss the same document.
+
+    mongomock applies each upsert at once, while MongoDB may match two
+    upserts against a missing document and then reject the second insert
+    with a duplicate key error. Here an upsert that finds nothing yields to
+    the other tasks before inserting, reproducing that interleaving.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def update_one(self, query, update, upsert=False, **kwargs):
+        if upsert and await self.collection.find_one({"_id": query["_id"]}) is None:
+            await asyncio.sleep(0)
+            # Only the first of the racing upserts creates the document
+            await self.collection.insert_one({"_id": query["_id"]})
+        return await self.collection.update_one(query, update, upsert=upsert, **kwargs)
+
+@pytest.fixture
+def client():
+    import server
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def service_id(client):
+    return client.get("/api/services").json()[0]["id"]
+
+@pytest.fixture
+def booking_payload(service_id):
+    def payload(date: str = "2030-03-01", time: str = "08:00", **fields) -> dict:
+        return {
+            "service_id": service_id,
+            "customer_name": "Maria Silva",
+            "customer_phone": "+55 21 99999-0000",
+            "customer_email": "maria@example.com",
+            "vehicle_model": "Onix",
+            "vehicle_plate": "ABC-1D23",
+            "date": date,
+            "time": time,
+            **fields
+        }
+    return payload
@@ -0,0 +1,52 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from availability import AvailabilityEngine
+from tests.conftest import UpsertRace
+
+def make_engine(capacity: int = 1) -> AvailabilityEngine:
+    return AvailabilityEngine(UpsertRace(AsyncMongoMockClient()["test"]["occupancy"]), capacity=capacity)
+
+def test_cells_for_rejects_times_outside_working_hours():
+    engine = make_engine()
+    assert engine.cells_for("08:00", 60) == [32, 33, 34, 35]
+    assert engine.cells_for("11:00", 90) is None
+    assert engine.cells_for("08:30", 30) is None
+
+def test_racing_reservations_on_a_new_day_both_succeed_when_they_do_not_overlap():
+    async def scenario():
+        engine = make_engine()
+        results = await asyncio.gather(
+            engine.reserve("2030-01-15", "08:00", 60),
+            engine.reserve("2030-01-15", "13:00", 60)
+        )
+        return results, await engine.get_cells("2030-01-15")
+
+    results, cells = asyncio.run(scenario())
+    assert results == [True, True]
+    assert cells == {str(index): 1 for index in (32, 33, 34, 35, 52, 53, 54, 55)}
+
+def test_racing_reservations_for_the_same_slot_have_one_winner():
+    async def scenario():
+        engine = make_engine()
+        return await asyncio.gather(*(engine.reserve("2030-01-15", "08:00", 60) for _ in range(3)))
+
+    assert sorted(asyncio.run(scenario())) == [False, False, True]
+
+def test_capacity_allows_parallel_bays():
+    async def scenario():
+        engine = make_engine(capacity=2)
+        return await asyncio.gather(*(engine.reserve("2030-01-15", "08:00", 60) for _ in range(3)))
+
+    assert sorted(asyncio.run(scenario())) == [False, True, True]
+
+def test_release_frees_the_cells():
+    async def scenario():
+        engine = make_engine()
+        assert await engine.reserve("2030-01-15", "08:00", 60)
+        assert not await engine.reserve("2030-01-15", "08:00", 30)
+        await engine.release("2030-01-15", "08:00", 60)
+        return await engine.reserve("2030-01-15", "08:00", 30)
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,129 @@
+import pytest
+from fastapi import HTTPException
+
+from server import decode_booking_cursor, encode_booking_cursor, normalize_phone, normalize_plate
+
+def create(client, booking_payload, time: str = "08:00") -> dict:
+    response = client.post("/api/bookings", json=booking_payload(time=time))
+    assert response.status_code == 200
+    return response.json()
+
+def test_status_follows_the_transitions(client, booking_payload):
+    booking = create(client, booking_payload)
+
+    confirmed = client.patch(f"/api/bookings/{booking['id']}", json={"status": "confirmed"})
+    assert confirmed.status_code == 200
+    assert confirmed.json()["version"] == booking["version"] + 1
+
+    # confirmed can't go back to pending
+    response = client.patch(f"/api/bookings/{booking['id']}", json={"status": "pending"})
+    assert response.status_code == 400
+
+def test_final_status_is_never_left(client, booking_payload):
+    booking = create(client, booking_payload)
+    assert client.patch(f"/api/bookings/{booking['id']}", json={"status": "cancelled"}).status_code == 200
+
+    for status in ("pending", "confirmed", "completed"):
+        response = client.patch(f"/api/bookings/{booking['id']}", json={"status": status})
+        assert response.status_code == 400
+
+def test_stale_version_is_a_conflict(client, booking_payload):
+    booking = create(client, booking_payload)
+    version = booking["version"]
+    assert client.patch(
+        f"/api/bookings/{booking['id']}", json={"status": "confirmed", "version": version}
+    ).status_code == 200
+
+    response = client.patch(
+        f"/api/bookings/{booking['id']}", json={"status": "cancelled", "version": version}
+    )
+    assert response.status_code == 409
+
+def test_bulk_update_answers_each_item(client, booking_payload):
+    pending = create(client, booking_payload, "08:00")
+    cancelled = create(client, booking_payload, "10:00")
+    stale = create(client, booking_payload, "13:00")
+    client.patch(f"/api/bookings/{cancelled['id']}", json={"status": "cancelled"})
+    client.patch(f"/api/bookings/{stale['id']}", json={"status": "confirmed"})
+
+    response = client.patch("/api/bookings:bulk", json={"items": [
+        {"id": pending["id"], "status": "confirmed"},
+        {"id": cancelled["id"], "status": "confirmed"},
+        {"id": stale["id"], "status": "completed", "version": stale["version"]},
+        {"id": "missing", "status": "confirmed"},
+        {"id": pending["id"], "status": "cancelled"}
+    ]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [200, 400, 409, 404, 400]
+    assert [result["id"] for result in results] == [pending["id"], cancelled["id"], stale["id"], "missing", pending["id"]]
+    assert results[0]["booking"]["status"] == "confirmed"
+    assert "detail" in results[1]
+    assert client.get(f"/api/bookings/{pending['id']}").json()["status"] == "confirmed"
+
+def test_listing_pages_with_the_cursor(client, booking_payload):
+    created = {create(client, booking_payload, time)["id"] for time in ("08:00", "10:00", "13:00")}
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/bookings", params=params).json()
+        seen.extend(booking["id"] for booking in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == 3
+    assert set(seen) == created
+
+def test_cursor_round_trip():
+    booking = {"created_at": "2030-03-01T08:00:00+00:00", "id": "b1"}
+    assert decode_booking_cursor(encode_booking_cursor(booking)) == ("2030-03-01T08:00:00+00:00", "b1")
+
+@pytest.mark.parametrize("cursor", ["not base64!", "WzFd", "eyJhIjoxfQ"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_booking_cursor(cursor)
+    assert error.value.status_code == 400
+
+@pytest.mark.parametrize("phone, digits", [
+    ("+55 21 99999-0000", "21999990000"),
+    ("5521999990000", "21999990000"),
+    ("(21) 99999-0000", "21999990000"),
+    ("+55 21", "21"),
+    # A local number that happens to start with 55
+    ("55 9999-0000", "5599990000"),
+])
+def test_normalize_phone(phone, digits):
+    assert normalize_phone(phone) == digits
+
+def test_normalize_plate():
+    assert normalize_plate("abc-1d23") == normalize_plate("ABC 1D23") == "ABC1D23"
+
+def test_archived_bookings_are_listed_on_request(client, booking_payload):
+    import server
+
+    old = [create(client, booking_payload, time) for time in ("08:00", "10:00", "13:00")]
+    recent = create(client, booking_payload, "14:00")
+    for booking in old:
+        client.patch(f"/api/bookings/{booking['id']}", json={"status": "cancelled"})
+    client.portal.call(server.db.bookings.update_many, {"id": {"$in": [b["id"] for b in old]}}, {"$set": {"date": "2000-01-01"}})
+    assert client.portal.call(server.archiver.archive_once) == 3
+
+    current = client.get("/api/bookings").json()
+    assert [booking["id"] for booking in current["items"]] == [recent["id"]]
+
+    first = client.get("/api/bookings", params={"archived": "true", "limit": 2}).json()
+    rest = client.get("/api/bookings", params={"archived": "true", "cursor": first["next_cursor"]}).json()
+    listed = [booking["id"] for booking in first["items"] + rest["items"]]
+    newest_first = sorted(old, key=lambda booking: (booking["created_at"], booking["id"]), reverse=True)
+    assert listed == [booking["id"] for booking in newest_first]
+    assert rest["next_cursor"] is None
+
+@pytest.mark.parametrize("date", ["not-a-date", "01/03/2030", "20300301", "2030-02-30", "2000-01-01"])
+def test_booking_date_must_be_an_upcoming_iso_date(client, booking_payload, date):
+    response = client.post("/api/bookings", json=booking_payload(date=date))
+    assert response.status_code == 422
+    assert client.get("/api/bookings").json()["items"] == []
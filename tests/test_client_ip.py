@@ -0,0 +1,44 @@
+import pytest
+from starlette.requests import Request
+
+from server import client_ip
+
+def make_request(*forwarded: str) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded],
+        "client": ("10.0.0.2", 1234)
+    })
+
+def test_forwarded_header_is_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.delenv("TRUST_PROXY_HEADERS", raising=False)
+    assert client_ip(make_request("203.0.113.7")) == "10.0.0.2"
+
+@pytest.mark.parametrize("hops, expected", [("1", "198.51.100.4"), ("2", "203.0.113.7"), ("5", "1.2.3.4")])
+def test_client_is_counted_from_the_right(monkeypatch, hops, expected):
+    monkeypatch.setenv("TRUST_PROXY_HEADERS", hops)
+    # 1.2.3.4 is what the client itself sent
+    request = make_request("1.2.3.4, 203.0.113.7", "198.51.100.4")
+    assert client_ip(request) == expected
+
+def test_missing_forwarded_header_falls_back_to_the_peer(monkeypatch):
+    monkeypatch.setenv("TRUST_PROXY_HEADERS", "1")
+    assert client_ip(make_request()) == "10.0.0.2"
+
+def limiter_kinds(client, monkeypatch, **env) -> set:
+    import server
+
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "memory")
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    # Reconnect with the new settings
+    client.portal.call(server.shutdown_db_client)
+    client.get("/api/services")
+    return set(server.booking_limiters)
+
+def test_ip_limit_waits_for_the_proxy_setting(client, monkeypatch):
+    monkeypatch.delenv("TRUST_PROXY_HEADERS", raising=False)
+    assert limiter_kinds(client, monkeypatch) == {"phone", "email"}
+
+def test_ip_limit_applies_once_proxies_are_configured(client, monkeypatch):
+    assert limiter_kinds(client, monkeypatch, TRUST_PROXY_HEADERS="0") == {"ip", "phone", "email"}
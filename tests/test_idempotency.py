@@ -0,0 +1,36 @@
+from idempotency import IdempotencyStore
+from rate_limit import MemoryRateLimiter
+
+def test_new_keys_are_limited_before_they_are_stored(client, booking_payload, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "booking_limiters", {"ip": MemoryRateLimiter(1, 3600)})
+    begun = []
+    begin = IdempotencyStore.begin
+
+    async def spy(self, key, fingerprint):
+        begun.append(key)
+        return await begin(self, key, fingerprint)
+
+    monkeypatch.setattr(IdempotencyStore, "begin", spy)
+    first = client.post("/api/bookings", json=booking_payload(), headers={"Idempotency-Key": "first"})
+    assert first.status_code == 200
+
+    limited = client.post("/api/bookings", json=booking_payload(time="13:00"), headers={"Idempotency-Key": "second"})
+    assert limited.status_code == 429
+    assert "bookings:second" not in begun
+
+    retry = client.post("/api/bookings", json=booking_payload(), headers={"Idempotency-Key": "first"})
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+def test_booking_is_returned_when_the_key_cannot_be_completed(client, booking_payload, monkeypatch):
+    async def fail(self, key, status_code, body):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(IdempotencyStore, "complete", fail)
+    response = client.post("/api/bookings", json=booking_payload(), headers={"Idempotency-Key": "lost"})
+
+    assert response.status_code == 200
+    assert client.get(f"/api/bookings/{response.json()['id']}").status_code == 200
@@ -0,0 +1,97 @@
+import json
+
+import server
+from tests.conftest import UpsertRace
+
+def ndjson(rows) -> str:
+    return "\n".join(json.dumps(row) for row in rows)
+
+def test_import_fills_a_new_day_without_false_conflicts(client, booking_payload):
+    server.availability.collection = UpsertRace(server.availability.collection)
+    times = ["08:00", "09:00", "10:00", "11:00", "13:00", "14:00"]
+    rows = [booking_payload(date="2030-04-01", time=time) for time in times]
+    # Same slot as the first row: the only real conflict
+    rows.append(booking_payload(date="2030-04-01", time="08:00"))
+
+    report = client.post("/api/bookings/import?format=ndjson", content=ndjson(rows)).json()
+
+    assert report["imported"] == len(times)
+    assert report["conflicts"] == 1
+    assert report["errors"][0]["detail"] == "Horário não disponível"
+    slots = client.get("/api/timeslots", params={"date": "2030-04-01"}).json()
+    assert [slot["time"] for slot in slots if not slot["available"]] == times
+
+def test_import_rejects_known_ids(client, booking_payload):
+    row = booking_payload(id="imported-1", status="completed")
+    assert client.post("/api/bookings/import?format=ndjson", content=ndjson([row])).json()["imported"] == 1
+
+    report = client.post("/api/bookings/import?format=ndjson", content=ndjson([row])).json()
+    assert report["imported"] == 0
+    assert report["errors"][0]["detail"] == "Agendamento já existe"
+
+def test_csv_export_escapes_formulas_and_imports_back(client, booking_payload):
+    row = booking_payload(customer_name="=HYPERLINK(\"http://x\")", vehicle_model="Onix\nPrata, 2020")
+    booking = client.post("/api/bookings", json=row).json()
+
+    exported = client.get("/api/bookings/export", params={"format": "csv"}).text
+    assert "'=HYPERLINK" in exported
+    assert "'+55 21 99999-0000" in exported
+
+    # Load the file into an empty database
+    client.portal.call(server.shutdown_db_client)
+    report = client.post("/api/bookings/import?format=csv", content=exported).json()
+    assert report["imported"] == 1, report
+
+    imported = client.get(f"/api/bookings/{booking['id']}").json()
+    assert imported["customer_name"] == row["customer_name"]
+    assert imported["customer_phone"] == row["customer_phone"]
+    assert imported["vehicle_model"] == row["vehicle_model"]
+
+def test_csv_rows_are_numbered_by_their_first_line(client, booking_payload):
+    row = booking_payload(vehicle_model="Onix\nPrata")
+    fields = list(row)
+    lines = [",".join(fields), ",".join(f'"{row[field]}"' for field in fields), ",".join(fields[:2])]
+
+    report = client.post("/api/bookings/import?format=csv", content="\n".join(lines)).json()
+
+    assert report["imported"] == 1
+    assert [error["line"] for error in report["errors"]] == [4]
+
+def test_finished_rows_are_validated_like_active_ones(client, booking_payload):
+    rows = [
+        booking_payload(date="2020-05-04", time="09.00", status="completed"),
+        booking_payload(date="04/05/2020", status="cancelled"),
+        booking_payload(date="2020-05-04", time="09:00", status="completed")
+    ]
+
+    report = client.post("/api/bookings/import?format=ndjson", content=ndjson(rows)).json()
+
+    assert report["imported"] == 1
+    assert report["invalid"] == 2
+    assert [error["line"] for error in report["errors"]] == [1, 2]
+    response = client.get("/api/reports", params={"from": "2020-05-01", "to": "2020-05-31"})
+    assert response.status_code == 200
+    assert response.json()["totals"]["bookings"] == 1
+
+def csv_file(rows) -> str:
+    fields = list(rows[0])
+    return "\n".join([",".join(fields)] + [",".join(str(row[field]) for field in fields) for row in rows])
+
+def test_stray_quote_inside_a_csv_value_is_text(client, booking_payload):
+    times = ["08:00", "10:00", "13:00", "15:00"]
+    rows = [booking_payload(time=time, vehicle_model='Aro 20" sport') for time in times]
+
+    report = client.post("/api/bookings/import?format=csv", content=csv_file(rows)).json()
+
+    assert report["imported"] == 4, report
+    models = {booking["vehicle_model"] for booking in client.get("/api/bookings").json()["items"]}
+    assert models == {'Aro 20" sport'}
+
+def test_unclosed_quote_fails_only_its_own_row(client, booking_payload):
+    rows = [booking_payload(time=time) for time in ["08:00", "10:00", "13:00", "15:00"]]
+    rows[1]["vehicle_model"] = '"Onix'
+
+    report = client.post("/api/bookings/import?format=csv", content=csv_file(rows)).json()
+
+    assert report["imported"] == 3, report
+    assert report["errors"] == [{"line": 3, "id": None, "type": "invalid", "detail": "Aspas não fechadas"}]
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from metrics import NOTIFICATION_SEND_DURATION, timed_batch_sender
+
+def sample_count(channel: str, outcome: str) -> float:
+    for metric in NOTIFICATION_SEND_DURATION.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count") and sample.labels == {"channel": channel, "outcome": outcome}:
+                return sample.value
+    return 0.0
+
+def test_batch_outcomes_are_recorded_per_notification():
+    async def send(notifications):
+        return [True, False, ConnectionError("refused"), True]
+
+    sender = timed_batch_sender("test_batch", send)
+    results = asyncio.run(sender([{}, {}, {}, {}]))
+
+    assert results[:2] == [True, False]
+    assert sample_count("test_batch", "ok") == 2
+    assert sample_count("test_batch", "skipped") == 1
+    assert sample_count("test_batch", "error") == 1
+
+def test_failed_batch_counts_every_notification_as_an_error():
+    async def send(notifications):
+        raise ConnectionError("refused")
+
+    sender = timed_batch_sender("test_failed_batch", send)
+    with pytest.raises(ConnectionError):
+        asyncio.run(sender([{}, {}]))
+
+    assert sample_count("test_failed_batch", "error") == 2
+    assert sample_count("test_failed_batch", "ok") == 0
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from migrations import Migration, apply_migrations
+
+def test_concurrent_workers_apply_a_migration_once():
+    meta = AsyncMongoMockClient()["test"]["meta"]
+    calls = []
+
+    async def apply():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+
+    migration = Migration("rebuild", "v1", apply)
+
+    async def start_workers():
+        return await asyncio.gather(*(
+            apply_migrations(meta, [migration], poll_seconds=0.01) for _ in range(4)
+        ))
+
+    results = asyncio.run(start_workers())
+
+    assert len(calls) == 1
+    assert sorted(results) == [[], [], [], ["rebuild"]]
+    assert asyncio.run(meta.find_one({"_id": "migration:rebuild:lock"})) is None
+
+def test_expired_claim_is_taken_over():
+    meta = AsyncMongoMockClient()["test"]["meta"]
+    calls = []
+
+    async def apply():
+        calls.append(1)
+
+    async def run():
+        # Left behind by a worker that died while applying
+        await meta.insert_one({
+            "_id": "migration:rebuild:lock",
+            "owner": "gone",
+            "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)
+        })
+        return await apply_migrations(meta, [Migration("rebuild", "v1", apply)])
+
+    assert asyncio.run(run()) == ["rebuild"]
+    assert len(calls) == 1
+
+def test_changed_checksum_is_applied_again():
+    meta = AsyncMongoMockClient()["test"]["meta"]
+    calls = []
+
+    async def apply():
+        calls.append(1)
+
+    async def run():
+        await apply_migrations(meta, [Migration("rebuild", "v1", apply)])
+        await apply_migrations(meta, [Migration("rebuild", "v1", apply)])
+        await apply_migrations(meta, [Migration("rebuild", "v2", apply)])
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+def test_bumping_occupancy_version_repairs_leaked_cells(client, booking_payload, monkeypatch):
+    import server
+
+    assert client.post("/api/bookings", json=booking_payload(time="08:00")).status_code == 200
+    booked = client.portal.call(server.availability.get_cells, "2030-03-01")
+    # A reservation whose booking was never written
+    assert client.portal.call(server.availability.reserve, "2030-03-01", "13:00", 60)
+
+    monkeypatch.setattr(server, "MIGRATIONS", [
+        migration if migration.name != "occupancy"
+        else Migration("occupancy", "repair", server.rebuild_occupancy)
+        for migration in server.MIGRATIONS
+    ])
+    client.portal.call(server.run_migrations)
+
+    assert client.portal.call(server.availability.get_cells, "2030-03-01") == booked
+
+def test_first_request_starts_a_process_that_skipped_the_lifespan(client):
+    import server
+
+    # As if the platform never ran the lifespan
+    client.portal.call(server.shutdown_db_client)
+    assert not server.started
+
+    assert client.get("/api/services").json()
+    assert server.started
+    assert server.outbox._tasks
@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from outbox import DEAD, PENDING, PROCESSING, SENT, SKIPPED, NotificationOutbox
+
+def make_outbox(senders=None, **options) -> NotificationOutbox:
+    collection = AsyncMongoMockClient()["test"]["notification_outbox"]
+    return NotificationOutbox(collection, senders or {}, **options)
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def notification(recipient: str, channel: str = "whatsapp") -> dict:
+    return {"channel": channel, "recipient": recipient, "body": "Olá"}
+
+def test_claim_leases_each_notification_once():
+    outbox = make_outbox(lease_seconds=120)
+
+    async def scenario():
+        await outbox.enqueue([notification("a"), notification("b")], booking_id="b1")
+        return [await outbox.claim() for _ in range(3)]
+
+    first, second, third = asyncio.run(scenario())
+    assert {first["recipient"], second["recipient"]} == {"a", "b"}
+    assert third is None
+    assert first["status"] == PROCESSING
+    assert first["attempts"] == 1
+    assert first["booking_id"] == "b1"
+    lease = as_utc(first["next_attempt_at"]) - datetime.now(timezone.utc)
+    assert timedelta(seconds=110) < lease <= timedelta(seconds=120)
+
+def test_expired_lease_is_claimed_again():
+    outbox = make_outbox(lease_seconds=0.05)
+
+    async def scenario():
+        await outbox.enqueue([notification("a")])
+        claimed = await outbox.claim()
+        held = await outbox.claim()
+        await asyncio.sleep(0.1)
+        return claimed, held, await outbox.claim()
+
+    claimed, held, reclaimed = asyncio.run(scenario())
+    assert held is None
+    assert reclaimed["_id"] == claimed["_id"]
+    assert reclaimed["attempts"] == 2
+
+def test_claim_by_channel_leaves_other_channels():
+    outbox = make_outbox()
+
+    async def scenario():
+        await outbox.enqueue([notification("a", "whatsapp"), notification("b", "email")])
+        return await outbox.claim("email"), await outbox.claim("email")
+
+    email, none_left = asyncio.run(scenario())
+    assert email["recipient"] == "b"
+    assert none_left is None
+
+def test_failed_send_is_retried_after_a_backoff():
+    async def fail(item):
+        raise ConnectionError("refused")
+
+    outbox = make_outbox({"whatsapp": fail}, base_delay=10)
+
+    async def scenario():
+        await outbox.enqueue([notification("a")])
+        await outbox.process(await outbox.claim())
+        return await outbox.collection.find_one({})
+
+    stored = asyncio.run(scenario())
+    assert stored["status"] == PENDING
+    assert stored["last_error"] == "refused"
+    delay = as_utc(stored["next_attempt_at"]) - datetime.now(timezone.utc)
+    assert timedelta(seconds=7) < delay <= timedelta(seconds=12)
+
+def test_backoff_doubles_up_to_the_maximum():
+    outbox = make_outbox(base_delay=5, max_delay=60)
+    for attempts, expected in [(1, 5), (2, 10), (3, 20), (4, 40), (5, 60), (9, 60)]:
+        assert expected * 0.8 <= outbox.backoff(attempts) <= expected * 1.2
+
+def test_notification_is_dead_after_max_attempts():
+    async def fail(item):
+        raise ConnectionError("refused")
+
+    outbox = make_outbox({"whatsapp": fail}, max_attempts=3, base_delay=0)
+
+    async def scenario():
+        await outbox.enqueue([notification("a")])
+        statuses = []
+        for _ in range(4):
+            claimed = await outbox.claim()
+            if claimed is None:
+                break
+            await outbox.process(claimed)
+            statuses.append((await outbox.collection.find_one({}))["status"])
+        return statuses
+
+    assert asyncio.run(scenario()) == [PENDING, PENDING, DEAD]
+
+def test_sender_outcomes_are_stored():
+    async def send(item):
+        return item["recipient"] != "skip"
+
+    outbox = make_outbox({"whatsapp": send})
+
+    async def scenario():
+        await outbox.enqueue([notification("send"), notification("skip")])
+        for _ in range(2):
+            await outbox.process(await outbox.claim())
+        return {item["recipient"]: item["status"] async for item in outbox.collection.find({})}
+
+    assert asyncio.run(scenario()) == {"send": SENT, "skip": SKIPPED}
+
+def test_batch_results_apply_per_notification():
+    async def send_batch(items):
+        return [True, ConnectionError("refused"), False]
+
+    outbox = make_outbox(batch_senders={"email": send_batch})
+
+    async def scenario():
+        await outbox.enqueue([notification(name, "email") for name in ("a", "b", "c")])
+        batch = [await outbox.claim("email") for _ in range(3)]
+        await outbox.process_batch(batch)
+        return {item["recipient"]: item["status"] async for item in outbox.collection.find({})}
+
+    assert asyncio.run(scenario()) == {"a": SENT, "b": PENDING, "c": SKIPPED}
+
+def test_workers_drain_the_queue():
+    delivered = []
+
+    async def send(item):
+        delivered.append(item["recipient"])
+        return True
+
+    outbox = make_outbox({"whatsapp": send}, workers=2, poll_interval=0.05)
+
+    async def scenario():
+        outbox.start()
+        await outbox.enqueue([notification(str(index)) for index in range(5)])
+        for _ in range(50):
+            if len(delivered) == 5:
+                break
+            await asyncio.sleep(0.02)
+        await outbox.stop()
+
+    asyncio.run(scenario())
+    assert sorted(delivered) == ["0", "1", "2", "3", "4"]
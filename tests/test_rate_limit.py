@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from rate_limit import MongoRateLimiter
+
+def make_collection():
+    return AsyncMongoMockClient()["test"]["rate_limits"]
+
+def test_buckets_are_shared_between_workers():
+    async def scenario():
+        collection = make_collection()
+        first = MongoRateLimiter(collection, "booking_ip", 2, 3600)
+        second = MongoRateLimiter(collection, "booking_ip", 2, 3600)
+        waits = [await first.hit("1.2.3.4"), await second.hit("1.2.3.4"), await second.hit("1.2.3.4")]
+        bucket = await collection.find_one({"_id": "booking_ip:1.2.3.4"})
+        return waits, bucket
+
+    waits, bucket = asyncio.run(scenario())
+    assert waits[:2] == [0.0, 0.0]
+    # One token refills every 1800 seconds
+    assert waits[2] == pytest.approx(1800, rel=0.01)
+    assert bucket["tokens"] < 1
+    assert bucket["expires_at"] > bucket["updated_at"]
+
+def test_tokens_refill_over_time():
+    async def scenario():
+        limiter = MongoRateLimiter(make_collection(), "booking_ip", 1, 0.2)
+        waits = [await limiter.hit("key"), await limiter.hit("key")]
+        await asyncio.sleep(0.25)
+        waits.append(await limiter.hit("key"))
+        return waits
+
+    first, limited, refilled = asyncio.run(scenario())
+    assert first == 0.0
+    assert 0 < limited <= 0.2
+    assert refilled == 0.0
+
+def test_empty_buckets_are_answered_locally():
+    calls = []
+
+    async def scenario():
+        limiter = MongoRateLimiter(make_collection(), "booking_ip", 1, 3600)
+        take = limiter._take
+
+        def counted(key):
+            calls.append(key)
+            return take(key)
+
+        limiter._take = counted
+        return [await limiter.hit("key") for _ in range(3)]
+
+    waits = asyncio.run(scenario())
+    assert waits[0] == 0.0 and waits[1] > 0 and waits[2] > 0
+    assert len(calls) == 2
+
+def test_database_failure_lets_bookings_through():
+    async def scenario():
+        limiter = MongoRateLimiter(make_collection(), "booking_ip", 1, 3600)
+
+        async def unavailable(key):
+            raise ServerSelectionTimeoutError("no servers")
+
+        limiter._take = unavailable
+        return [await limiter.hit("key") for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [0.0, 0.0, 0.0]
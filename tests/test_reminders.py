@@ -0,0 +1,126 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from events import BookingEventBus
+from reminders import ReminderScheduler
+
+ZONE = ZoneInfo("America/Sao_Paulo")
+
+def booking(booking_id: str, starts_in: float, created_ago: float = 7 * 24 * 3600, **fields) -> dict:
+    """A booking whose appointment starts about starts_in seconds from now"""
+    start = datetime.fromtimestamp(time.time() + starts_in, ZONE)
+    # Appointments are on whole minutes; round up so it never starts early
+    start = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    return {
+        "id": booking_id,
+        "date": start.date().isoformat(),
+        "time": start.strftime("%H:%M"),
+        "status": "pending",
+        "created_at": datetime.fromtimestamp(time.time() - created_ago, timezone.utc).isoformat(),
+        **fields
+    }
+
+def make_scheduler(send=None, lead_hours: float = 24) -> ReminderScheduler:
+    async def record(booking):
+        pass
+
+    collection = AsyncMongoMockClient()["test"]["bookings"]
+    return ReminderScheduler(collection, send or record, lead_hours=lead_hours, window_hours=6)
+
+def test_track_schedules_reminders_due_before_the_horizon():
+    scheduler = make_scheduler()
+    scheduler._horizon = time.time() + 6 * 3600
+
+    scheduler.track(booking("soon", 25 * 3600))
+    scheduler.track(booking("later", 40 * 3600))
+
+    assert set(scheduler._scheduled) == {"soon"}
+    assert [booking_id for _, booking_id in scheduler._heap] == ["soon"]
+
+def test_bookings_made_within_the_lead_time_get_no_reminder():
+    scheduler = make_scheduler()
+    scheduler._horizon = time.time() + 6 * 3600
+
+    scheduler.track(booking("last-minute", 3 * 3600, created_ago=60))
+
+    assert scheduler._scheduled == {}
+
+def test_cancelled_or_reminded_bookings_are_dropped():
+    scheduler = make_scheduler()
+    scheduler._horizon = time.time() + 6 * 3600
+    scheduler.track(booking("a", 25 * 3600))
+    scheduler.track(booking("b", 25 * 3600))
+
+    scheduler.track(booking("a", 25 * 3600, status="cancelled"))
+    scheduler.track(booking("b", 25 * 3600, reminder_sent_at="2030-01-01T00:00:00+00:00"))
+
+    assert scheduler._scheduled == {}
+
+def test_load_reads_unsent_reminders_from_the_database():
+    scheduler = make_scheduler()
+
+    async def scenario():
+        await scheduler.collection.insert_many([
+            booking("due", 25 * 3600),
+            booking("far", 40 * 3600),
+            booking("started", -3600),
+            booking("last-minute", 3 * 3600, created_ago=60),
+            booking("sent", 25 * 3600, reminder_sent_at=datetime.now(timezone.utc)),
+            booking("cancelled", 25 * 3600, status="cancelled")
+        ])
+        await scheduler.load()
+
+    asyncio.run(scenario())
+    assert set(scheduler._scheduled) == {"due"}
+
+def test_failed_send_gives_the_claim_back():
+    sent = []
+
+    async def send(claimed):
+        sent.append(claimed["id"])
+        if len(sent) == 1:
+            raise ConnectionError("smtp down")
+
+    scheduler = make_scheduler(send)
+
+    async def scenario():
+        await scheduler.collection.insert_one(booking("b1", 25 * 3600))
+        with pytest.raises(ConnectionError):
+            await scheduler._remind(booking("b1", 25 * 3600))
+        released = await scheduler.collection.find_one({"id": "b1"})
+        await scheduler._remind(booking("b1", 25 * 3600))
+        await scheduler._remind(booking("b1", 25 * 3600))
+        claimed = await scheduler.collection.find_one({"id": "b1"})
+        return released, claimed
+
+    released, claimed = asyncio.run(scenario())
+    assert "reminder_sent_at" not in released
+    assert "reminder_sent_at" in claimed
+    # Retried once after the failure, then never again
+    assert sent == ["b1", "b1"]
+
+def test_running_scheduler_sends_due_reminders():
+    sent = []
+
+    async def send(claimed):
+        sent.append(claimed["id"])
+
+    async def scenario():
+        upcoming = booking("b1", 0)
+        events = BookingEventBus()
+        scheduler = make_scheduler(send)
+        # Due a moment from now
+        start = scheduler.appointment_at(upcoming)
+        scheduler.lead_seconds = start - time.time() - 0.2
+        await scheduler.collection.insert_one(dict(upcoming))
+        scheduler.start(events)
+        await asyncio.sleep(0.6)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert sent == ["b1"]
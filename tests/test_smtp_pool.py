@@ -0,0 +1,96 @@
+import asyncio
+import socket
+from email.message import EmailMessage
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from smtp_pool import SMTPPool
+
+class Recorder:
+    """Keeps every message with the session it arrived on"""
+
+    def __init__(self):
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if envelope.content and b"Subject: drop" in envelope.content:
+            server.transport.close()
+            return "421 Closing connection"
+        self.received.append(session)
+        return "250 OK"
+
+    @property
+    def sessions(self) -> int:
+        return len({id(session) for session in self.received})
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = Recorder()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller
+    controller.stop()
+
+def message(subject: str = "Agendamento") -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = "loja@example.com"
+    msg["To"] = "cliente@example.com"
+    msg["Subject"] = subject
+    msg.set_content("Olá")
+    return msg
+
+def make_pool(controller) -> SMTPPool:
+    # A plain local relay: no STARTTLS and no login
+    return SMTPPool(controller.hostname, controller.port, start_tls=False, size=1)
+
+def test_batches_reuse_one_session(smtp_server):
+    async def send():
+        pool = make_pool(smtp_server)
+        results = [
+            await pool.send_batch([message(), message(), message()]),
+            await pool.send_batch([message(), message()])
+        ]
+        await pool.close()
+        return results
+
+    assert asyncio.run(send()) == [[None, None, None], [None, None]]
+    assert len(smtp_server.handler.received) == 5
+    assert smtp_server.handler.sessions == 1
+
+def test_broken_session_is_discarded(smtp_server):
+    async def send():
+        pool = make_pool(smtp_server)
+        broken = await pool.send_batch([message(), message("drop"), message()])
+        idle_after_break = len(pool._idle)
+        retried = await pool.send_batch([message()])
+        await pool.close()
+        return broken, idle_after_break, retried
+
+    broken, idle_after_break, retried = asyncio.run(send())
+
+    assert broken[0] is None
+    assert all(isinstance(error, Exception) for error in broken[1:])
+    assert idle_after_break == 0
+    assert retried == [None]
+    assert smtp_server.handler.sessions == 2
+
+def test_relay_without_credentials_gets_a_pool(client):
+    import server
+
+    client.portal.call(server.notification_config.save, {
+        "smtp_server": "relay.internal",
+        "smtp_port": "25",
+        "smtp_starttls": "false",
+        "from_email": "loja@example.com"
+    })
+    pool = client.portal.call(server.get_smtp_pool)
+
+    assert pool is not None
+    assert not pool.username
+    assert not pool.start_tls